@@ -1,6 +1,91 @@
 import matplotlib as plt
 import os
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def runLengthEncode(trigger):
+    """Run-length encodes a binary (0/1) trigger signal in one vectorised pass. Returns (levels, lengths): the level of each run and
+    its length in samples. A RunLengthTrigger is already encoded, so its runs are returned as they are."""
+    if isinstance(trigger, RunLengthTrigger):
+        return trigger.levels.copy(), trigger.lengths.copy()
+    trigger = np.asarray(trigger)
+    if len(trigger) == 0:
+        return np.zeros(0, np.int8), np.zeros(0, np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(trigger[1:] != trigger[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(trigger)))
+    return trigger[starts].astype(np.int8), lengths
+
+class RunLengthTrigger:
+    """Compact trigger signal, stored as runs: levels[k] (0 or 1) for lengths[k] samples. A trigger line only changes level a few
+    dozen times per event, so this is thousands of times smaller than one value per sample. SerialTriggerDecoder and EEGData accept it
+    wherever they take a trigger signal, and it can be saved next to the events files so triggers can be re-decoded without the
+    .Poly5 files."""
+
+    def __init__(self, levels, lengths):
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+
+    @classmethod
+    def fromArray(cls, trigger):
+        return cls(*runLengthEncode(trigger))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as runs:
+            return cls(runs['levels'], runs['lengths'])
+
+    def save(self, path):
+        """Saves the runs to path as a compressed .npz file."""
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, levels=self.levels, lengths=self.lengths)
+
+    def toArray(self):
+        """The trigger signal, one uint8 value per sample."""
+        return np.repeat(self.levels.astype(np.uint8), self.lengths)
+
+    @property
+    def num_samples(self):
+        return int(self.lengths.sum())
+
+    def __len__(self):
+        return self.num_samples
+
+#Decoded events as a structured array. flags is a bitwise OR of the EVENT_FLAG_* values below. confidence and
+#max_deviation are as in the event dicts from SerialTriggerDecoder.decode (NaN for events added by hand, without them).
+EVENT_DTYPE = np.dtype([('sample_idx', np.int64), ('code', np.int64), ('nbits', np.int16), ('flags', np.uint8),
+                        ('confidence', np.float32), ('max_deviation', np.float32)])
+EVENT_FLAG_PATTERN_TOO_LONG = 1 #More than 8 bits
+EVENT_FLAG_CODE_TOO_LARGE = 2 #Code above 159, the largest used in the experiment
+EVENT_FLAG_CODE_OVERFLOW = 4 #Pattern too long to store the code as int64 (code is set to -1)
+EVENT_FLAG_LOW_CONFIDENCE = 8 #Confidence below MIN_CONFIDENCE: at least one bit was near the edge of its timing window
+
+MIN_CONFIDENCE = 0.1
+
+def eventsToArray(events, minConfidence=MIN_CONFIDENCE):
+    """Converts a list of event dicts, as returned by SerialTriggerDecoder.decode, to a structured array with EVENT_DTYPE."""
+    eventArray = np.zeros(len(events), dtype=EVENT_DTYPE)
+    for n, event in enumerate(events):
+        nbits = len(event['pattern'])
+        confidence = event.get('confidence', np.nan)
+        deviations = event.get('deviations')
+        flags = 0
+        if nbits > 8:
+            flags |= EVENT_FLAG_PATTERN_TOO_LONG
+        if event['code'] > 159:
+            flags |= EVENT_FLAG_CODE_TOO_LARGE
+        if nbits > 63:
+            flags |= EVENT_FLAG_CODE_OVERFLOW
+        if confidence < minConfidence:
+            flags |= EVENT_FLAG_LOW_CONFIDENCE
+        eventArray[n] = (event['sample_idx'], event['code'] if nbits <= 63 else -1, nbits, flags, confidence,
+                         max(map(abs, deviations)) if deviations else np.nan)
+    return eventArray
+
+def suspectSamples(events):
+    """Error report for a structured array of events (see eventsToArray): the sample indices of events with any EVENT_FLAG_* set,
+    i.e. those worth checking by hand, e.g. when writing a trigger corrections file."""
+    return events['sample_idx'][events['flags'] != 0]
 
 class SerialTriggerDecoder:
     """
@@ -16,24 +101,32 @@ class SerialTriggerDecoder:
     """
     
     MAX_TRIG_DISTANCE = 1.5 #second
+    MIN_GLITCH_WIDTH = 5 #samples. Shorter pulses between two short runs of the other level are treated as glitches
     
-    def __init__(self, trigger, fsEEG, clkSerial, thrError, transError, max_trig_distance=MAX_TRIG_DISTANCE):
+    def __init__(self, trigger, fsEEG, clkSerial, thrError, transError, max_trig_distance=MAX_TRIG_DISTANCE, min_glitch_width=MIN_GLITCH_WIDTH):
         self.__fsEEG = fsEEG
         self.__clkSerial = clkSerial
         self.__trigger = trigger
         self.__transError = transError
         self.__thrError = thrError 
+        self.__setHalfPeriods()
+        self.__max_distance = max_trig_distance
+        self.__minGlitchWidth = min_glitch_width
+        self.reset()
+    
+    def __setHalfPeriods(self):
+        #Expected run lengths, in samples, for half a clock period. Recomputed whenever the rates or thrError change.
         self.__nHalfPeriod = round(self.__fsEEG/self.__clkSerial/2)
         self.__nHalfPeriod_low = self.__nHalfPeriod*(1+self.__thrError)
         self.__nHalfPeriod_high = self.__nHalfPeriod*(1-self.__thrError)
-        self.__max_distance = max_trig_distance
-    
+
     @property
     def fsEEG(self):
         return self.__fsEEG
     @fsEEG.setter
     def fsEEG(self, value):
         self.__fsEEG = value 
+        self.__setHalfPeriods()
 
     @property
     def clkSerial(self):
@@ -41,6 +134,7 @@ class SerialTriggerDecoder:
     @clkSerial.setter
     def clkSerial(self, value):
         self.__clkSerial = value 
+        self.__setHalfPeriods()
 
     @property
     def transError(self):
@@ -52,88 +146,241 @@ class SerialTriggerDecoder:
     @property
     def thrError(self):
         return self.__thrError
-    @transError.setter
+    @thrError.setter
     def thrError(self, value):
         self.__thrError = value
+        self.__setHalfPeriods()
+
+    def __countRuns(self):
+        #Run lengths in the (2, runs) layout used by the decoders: each column is a run, with its length in the row of its level.
+        #As in the original sample-by-sample loop, the first sample is not counted, so decoded sample indices are unchanged.
+        levels, lengths = runLengthEncode(self.__trigger)
+        counts = np.zeros((2, max(1, len(levels))), np.int32)
+        if len(levels) > 0:
+            lengths[0] -= 1
+            counts[levels, np.arange(len(levels))] = lengths
+        return counts
+
+    def reset(self):
+        """Clears the state kept between feed() calls, ready to decode a new trigger signal."""
+        self.__runLevel = None #Level and length of the last run seen, which may continue in the next chunk
+        self.__runLength = 0
+        self.__firstRun = True
+        self.__done = [] #Runs already visited by the glitch suppression, which may still be merged into
+        self.__todo = deque() #Runs still to visit; todo[0] is the current run and todo[1] the next
+        self.__final = [] #Runs the glitch suppression can no longer change, from the one before the next run to decode
+        self.__finalStart = 0 #Sample index of the start of __final[0]
+        self.__nextRun = 1 #Index in __final of the next run to decode
+        self.__event_started = False
+        self.__bit_pattern = ''
+        self.__deviations = []
+        self.__lastbit = 0
+        self.__event_idx = 0
+        self.__errorsLowerBound = 0
+
+    def __addRun(self, level, length):
+        #Runs are columns of the (2, runs) layout used by the decoders, with the length in the row of its level. As in the original
+        #sample-by-sample loop, the first sample is not counted, so decoded sample indices are unchanged.
+        if self.__firstRun:
+            length -= 1
+            self.__firstRun = False
+        run = [0, 0]
+        run[level] = length
+        self.__todo.append(run)
+
+    def __suppressGlitches(self, final):
+        """Merges glitches - a run shorter than min_glitch_width between two runs of the other level that are each shorter than a
+        full clock period - into the run before them. This is a single pass over the runs: those before the current one are kept on
+        a stack and those still to visit on another, so a merge costs O(1) instead of reallocating the whole array, while visiting
+        runs in the same order as the original in-place loop (including stepping back after a merge) so the output is identical.
+        A glitch in the first run, which has no run before it, is left alone. Unless this is the final call, it stops while fewer
+        than three runs are left to visit, as the next chunk could still change them."""
+        maxNeighbour = 2*self.__nHalfPeriod_high
+        done, todo = self.__done, self.__todo
+        while len(todo) > (1 if final else 2):
+            for lvl in (0, 1):
+                other = 1 - lvl
+                run = todo[0]
+                if (len(done) > 0 and len(todo) > 1 and run[lvl] > 0 and run[lvl] < self.__minGlitchWidth
+                    and done[-1][other] < maxNeighbour and todo[1][other] < maxNeighbour):
+                    done[-1][other] += run[lvl] + todo[1][other]
+                    todo.popleft()
+                    todo.popleft()
+                    todo.appendleft(done.pop()) #Step back, so the merged run is checked again
+            done.append(todo.popleft())
+
+        if final:
+            self.__final.extend(done)
+            self.__final.extend(todo)
+            done.clear()
+            todo.clear()
+        else:
+            #A low run of at least a clock period can't be a glitch's neighbour, so it is never merged into or stepped back to, and
+            #neither is anything before it. Runs up to the last such run are final.
+            for k in range(len(done)-1, -1, -1):
+                if done[k][1] == 0 and done[k][0] >= maxNeighbour:
+                    self.__final.extend(done[:k+1])
+                    del done[:k+1]
+                    break
+
+    def feed(self, chunk):
+        """Decodes the next chunk of a trigger signal that arrives in pieces, e.g. while it is streamed from disk or still being
+        recorded, without holding the whole signal. Partial runs and any event in progress are carried over to the next call, so
+        the events are the same as from decode() on the whole signal. Returns the events completed so far, in the same format as
+        decode(); call flush() after the last chunk for the rest."""
+        return self.__eventDicts(self.__feedRuns(chunk))
+
+    def flush(self):
+        """Ends a trigger signal given to feed(), returning its remaining events, and resets the decoder for the next one."""
+        return self.__eventDicts(self.__flushRuns())
 
     def decode(self, **kwargs):
-        errorsLowerBound = 0
-        
+        """Decodes the trigger signal into a list of events, each a dict with 'sample_idx', 'pattern' and 'code'. This discards any
+        partly fed signal.
+
+        Each event also has 'deviations', the timing deviation in samples of each bit (of the run that identified it, from the centre
+        of its window), and 'confidence', from 1 if every bit was centred to 0 if one was at the edge of its window. Both come from
+        the same pass as the decoding. See suspectSamples for a report of the events worth checking."""
         for key,value in kwargs.items():
             if key=='trigger':
                 self.__trigger = value
+        self.reset()
+        return self.__eventDicts(self.__feedRuns(self.__trigger) + self.__flushRuns())
+
+    def decodeToArray(self, **kwargs):
+        """As decode(), but returns a NumPy structured array with EVENT_DTYPE fields ('sample_idx', 'code', 'nbits', 'flags'), so
+        events can be filtered and compared with array operations."""
+        return eventsToArray(self.decode(**kwargs))
+
+    def decodeRunLengths(self, levels, lengths):
+        """As decode(), but for a trigger signal that is already run-length encoded, as (levels, lengths) from runLengthEncode.
+        This lets the same encoding be decoded with different settings without going back to the samples."""
+        self.reset()
+        return self.__eventDicts(self.__feedRunLengths(levels, lengths) + self.__flushRuns())
+
+    def __eventDicts(self, events):
+        #Each bit's confidence falls linearly from 1 at the centre of its timing window to 0 at the edges, and an event's is that of
+        #its least certain bit.
+        halfWidth = {'0': self.__nHalfPeriod_high*self.__transError, '1': self.__nHalfPeriod_low*self.__transError}
+        eventDicts = []
+        for event_idx, bit_pattern, deviations in events:
+            confidence = min([1 - abs(deviation)/abs(halfWidth[bit]) if halfWidth[bit] != 0 else 1.0
+                              for bit, deviation in zip(bit_pattern, deviations)] + [1.0])
+            eventDicts.append({'sample_idx':event_idx, 'pattern':bit_pattern, 'code':int(bit_pattern, 2),
+                               'deviations':deviations, 'confidence':max(0.0, confidence)})
+        return eventDicts
+
+    def __feedRuns(self, chunk):
+        return self.__feedRunLengths(*runLengthEncode(chunk))
+
+    def __feedRunLengths(self, levels, lengths):
+        if len(levels) == 0:
+            return []
+        levels, lengths = np.asarray(levels).tolist(), np.asarray(lengths).tolist()
+        if levels[0] == self.__runLevel: #The last run of the previous chunk carries on
+            lengths[0] += self.__runLength
+        elif self.__runLevel is not None:
+            self.__addRun(self.__runLevel, self.__runLength)
+        for level, length in zip(levels[:-1], lengths[:-1]):
+            self.__addRun(level, length)
+        self.__runLevel, self.__runLength = levels[-1], lengths[-1]
+
+        self.__suppressGlitches(final=False)
+        return self.__decodeRuns()
+
+    def __flushRuns(self):
+        if self.__runLevel is not None:
+            self.__addRun(self.__runLevel, self.__runLength)
+        self.__suppressGlitches(final=True)
+        events = self.__decodeRuns()
+        print("Errors - this is a LOWER BOUND estimate based on code sizes and pattern lengths: " + str(self.__errorsLowerBound))
+        self.reset()
+        return events
+
+    def __decodeRuns(self):
+        #Decodes the final runs, except the last one, which is needed to classify the one before it. Returns a list of
+        #(event_idx, bit_pattern) for the events finished.
         events = []
-        #Count samples of changed value (2 levels)
-        counts = np.zeros((2,1), np.int32)
-        nsamples = len(self.__trigger)
-        for i in range(1, nsamples):
-            if(self.__trigger[i] != self.__trigger[i-1]):
-                new_change = np.zeros((2,1), np.int16)
-                counts = np.concatenate((counts,new_change), axis=1)
-            counts[self.__trigger[i], counts.shape[1]-1]+=1
-        bit_pattern = ''
-        numOfChange = counts.shape[1]
-        #detect false jumping and clear (length < 5)
-        i=1
-        while i<numOfChange-1:
-            if  counts[0,i]>0 and counts[0,i]<5 and counts[1,i-1]<2*self.__nHalfPeriod_high and counts[1,i+1]<2*self.__nHalfPeriod_high:
-                counts[1,i-1] += (counts[0,i] + counts[1,i+1])
-                counts = np.delete(counts, [i,i+1], axis=1)
-                i -= 1
-                numOfChange-=2
-            if  counts[1,i]>0 and counts[1,i]<5 and counts[0,i-1]<2*self.__nHalfPeriod_high and counts[0,i+1]<2*self.__nHalfPeriod_high:
-                counts[0,i-1] += (counts[1,i] + counts[0,i+1])
-                counts = np.delete(counts, [i,i+1], axis=1)
-                i -= 1
-                numOfChange-=2
-            i+=1
+        numOfChange = len(self.__final)
+        if numOfChange < 3:
+            return events
+        counts = np.array(self.__final, dtype=np.int64).T
+
+        #Classify every run against the half-period windows at once. Whether a run is a Manchester 0 or 1 depends on the previous
+        #bit, so both cases are computed and the loop below only has to follow the state.
+        nH, nH_high, nH_low, trans = self.__nHalfPeriod, self.__nHalfPeriod_high, self.__nHalfPeriod_low, self.__transError
+        min_no_trig_duration = 2*max(nH_high, nH_low)*(1+trans)
+        prev0, cur0, cur1 = counts[0,:-2], counts[0,1:-1], counts[1,1:-1]
+        next0, next1 = counts[0,2:], counts[1,2:]
+        #Each array is indexed by i-1 for run i, as the first and last runs are never classified.
+        isStart = ((prev0 > min_no_trig_duration) & (cur1 >= nH_high*0.1) & (cur1 <= nH_high*(1+trans))
+                   & (next0 >= nH_low*(1-trans))).tolist()
+        isEnd = (cur0 > min_no_trig_duration).tolist()
+        isZero = [((cur1 >= (nH_high*(1-trans) + nH*lastbit)) & (cur1 <= (nH_high*(1+trans) + nH*lastbit))
+                   & (next0 >= nH_low*(1-trans))).tolist() for lastbit in (0, 1)]
+        isOne = [((cur0 >= (nH_low*(1-trans) + nH*(1-lastbit))) & (cur0 <= (nH_low*(1+trans) + nH*(1-lastbit)))
+                  & (next1 >= nH_high*(1-trans))).tolist() for lastbit in (0, 1)]
+        #If the next run is a single half period, it is the second half of the current bit and can be skipped.
+        nextIsHalfPeriod = (((next1 >= nH_high*(1-trans)) & (next1 <= nH_high*(1+trans)))
+                            | ((next0 >= nH_low*(1-trans)) & (next0 <= nH_low*(1+trans)))).tolist()
+        #Timing deviation, in samples, of each run from the centre of its window as a 0 or a 1, kept for each decoded bit
+        deviationZero = [np.round(cur1 - (nH_high + nH*lastbit), 3).tolist() for lastbit in (0, 1)]
+        deviationOne = [np.round(cur0 - (nH_low + nH*(1-lastbit)), 3).tolist() for lastbit in (0, 1)]
+        runStarts = np.concatenate(([0], np.cumsum(counts.sum(axis=0)))) + self.__finalStart
+        
         #decode
-        event_started = False
-        i = 1
-        lastbit = 0
-        event_idx = 0
-        min_no_trig_duration = 2*max(self.__nHalfPeriod_high, self.__nHalfPeriod_low)*(1+self.__transError) 
+        event_started = self.__event_started
+        bit_pattern = self.__bit_pattern
+        deviations = self.__deviations
+        i = self.__nextRun
+        lastbit = self.__lastbit
+        event_idx = self.__event_idx
         while i<numOfChange-1:
-            if (not event_started) and counts[0,i-1] > min_no_trig_duration and counts[1,i] >= self.__nHalfPeriod_high*0.1 and counts[1,i] <= self.__nHalfPeriod_high*(1+self.__transError) and counts[0,i+1] >= self.__nHalfPeriod_low*(1-self.__transError): #event started
+            if (not event_started) and isStart[i-1]: #event started
                 event_started = True
                 lastbit = 0
-                event_idx = np.sum(counts[:,:i])
-            elif event_started and counts[0,i] > min_no_trig_duration: #event finished
+                event_idx = runStarts[i]
+            elif event_started and isEnd[i-1]: #event finished
                 event_started = False
                 if len(bit_pattern) > 0:
-                    event = {
-                        'sample_idx':event_idx,
-                        'pattern':bit_pattern,
-                        'code':int(bit_pattern, 2)
-                    }
                     if len(bit_pattern) > 8 and int(bit_pattern, 2) > 159:
                         print("        WARNING: PATTERN TOO LONG. CODE VALUE IS ALSO TOO LARGE. This is at sample " + str(event_idx) + ".         ")
-                        errorsLowerBound += 1
+                        self.__errorsLowerBound += 1
                         
                     if len(bit_pattern) > 8 and int(bit_pattern, 2) < 160:  
-                        errorsLowerBound += 1
+                        self.__errorsLowerBound += 1
                         print("        WARNING: PATTERN TOO LONG. CODE VALUE IS NOT TOO LARGE. This is at sample " + str(event_idx) + ".         ")
                         
                     if len(bit_pattern) < 9 and int(bit_pattern, 2) > 159:  
                         print("        WARNING: CODE VALUE IS NOT TOO LARGE. PATTERN IS NOT TOO LONG. This is at sample " + str(event_idx) + ".         ")
-                        errorsLowerBound += 1
+                        self.__errorsLowerBound += 1
                         
-                    events.append(event)
+                    events.append((event_idx, bit_pattern, deviations))
                     bit_pattern = ''
+                    deviations = []
            
-            elif event_started and counts[1,i] >= (self.__nHalfPeriod_high*(1-self.__transError) + self.__nHalfPeriod*lastbit) and counts[1,i] <= (self.__nHalfPeriod_high*(1+self.__transError) + self.__nHalfPeriod*lastbit) and counts[0,i+1] >= self.__nHalfPeriod_low*(1-self.__transError): #Machester 0
+            elif event_started and isZero[lastbit][i-1]: #Machester 0
                 bit_pattern += '0'
+                deviations.append(deviationZero[lastbit][i-1])
                 lastbit = 0
-            elif event_started and counts[0,i] >= (self.__nHalfPeriod_low*(1-self.__transError) + self.__nHalfPeriod*(1-lastbit)) and counts[0,i] <= (self.__nHalfPeriod_low*(1+self.__transError) + self.__nHalfPeriod*(1-lastbit)) and counts[1,i+1] >= self.__nHalfPeriod_high*(1-self.__transError): #Machestor 1
+            elif event_started and isOne[lastbit][i-1]: #Machestor 1
                 bit_pattern += '1'
+                deviations.append(deviationOne[lastbit][i-1])
                 lastbit = 1
-            if len(bit_pattern) > 0 and ((counts[1,i+1]>=self.__nHalfPeriod_high*(1-self.__transError) and counts[1,i+1]<=self.__nHalfPeriod_high*(1+self.__transError)) or (counts[0,i+1]>=self.__nHalfPeriod_low*(1-self.__transError) and counts[0,i+1]<=self.__nHalfPeriod_low*(1+self.__transError))):
+            if len(bit_pattern) > 0 and nextIsHalfPeriod[i-1]:
                 i+=2
             else:
                 i+=1
-            
-        print("Errors - this is a LOWER BOUND estimate based on code sizes and pattern lengths: " + str(errorsLowerBound))
-            
+
+        #Keep the state for the next chunk, and only the runs still needed: the one before the next to decode, and those after it.
+        self.__event_started = event_started
+        self.__bit_pattern = bit_pattern
+        self.__deviations = deviations
+        self.__lastbit = lastbit
+        self.__event_idx = event_idx
+        self.__finalStart = int(runStarts[i-1])
+        del self.__final[:i-1]
+        self.__nextRun = 1
         return events
     
     #for bug fix of Yousef2 recording
@@ -145,13 +392,7 @@ class SerialTriggerDecoder:
                 self.__trigger = value
         events = []
         #Count samples of changed value (2 levels)
-        counts = np.zeros((2,1), np.int32)
-        nsamples = len(self.__trigger)
-        for i in range(1, nsamples):
-            if(self.__trigger[i] != self.__trigger[i-1]):
-                new_change = np.zeros((2,1), np.int16)
-                counts = np.concatenate((counts,new_change), axis=1)
-            counts[self.__trigger[i], counts.shape[1]-1]+=1
+        counts = self.__countRuns()
         plt.plot(self.__trigger)
         bit_pattern = ''
         numOfChange = counts.shape[1]
@@ -213,41 +454,60 @@ class SerialTriggerDecoder:
         
         return events
 
-    def decodeWithRef(self, trigRefPath):
-        thrErrorbk = self.__thrError
-        transErrorbk = self.__transError
+    def decodeWithRef(self, trigRefPath, workers=1, surface=False):
+        """Tries a grid of 5 thrError by 10 transError values around the current ones, and returns (events, accuracy) for the
+        setting whose codes best match the reference codes in trigRefPath (one per line, with -1 for a gap longer than
+        max_trig_distance). The trigger is run-length encoded once, and the settings are decoded here with workers=1 (the default),
+        or otherwise in a process pool of workers processes (None for the number of CPUs). Ties go to the first setting in the
+        original search order, and settings after the first with an accuracy of 1 are cancelled, so the result doesn't depend on
+        timing.
+
+        If surface is True, every setting is decoded, and (events, accuracy, accuracySurface) is returned. accuracySurface[m, n] is
+        the accuracy for thrError + 0.05*(m-2) and transError + 0.05*n."""
+        with open(trigRefPath, 'r') as refTrigFile:
+            trueEvents = np.array(refTrigFile.readlines(), dtype=np.int16)
+        levels, lengths = runLengthEncode(self.__trigger)
+
+        #Search order of the original serial loop
+        grid = [(m, n) for m in [0, -1, 1, -2, 2] for n in range(10)]
+        settings = [(self.__fsEEG, self.__clkSerial, self.__thrError + 0.05*m, self.__transError + 0.05*n, self.__max_distance,
+                     self.__minGlitchWidth) for m, n in grid]
+        accuracySurface = np.full((5, 10), np.nan)
+        results = {}
+
+        if workers == 1:
+            _sweepInit(levels, lengths, trueEvents)
+            for order, setting in enumerate(settings):
+                results[order] = _sweepDecode(setting)
+                if results[order][0] == 1 and not surface:
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_sweepInit, initargs=(levels, lengths, trueEvents)) as pool:
+                futures = {pool.submit(_sweepDecode, setting): order for order, setting in enumerate(settings)}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    order = futures[future]
+                    results[order] = future.result()
+                    if results[order][0] == 1 and not surface:
+                        for laterFuture, laterOrder in futures.items():
+                            if laterOrder > order:
+                                laterFuture.cancel()
 
-        refTrigFile = open(trigRefPath, 'r')
-        trueEvents = np.array(refTrigFile.readlines(), dtype=np.int16)
         outEvents = []
         maxAcc = 0
-        for m in [0, -1, 1, -2, 2]:
-            for n in range(10):
-                self.thrError = thrErrorbk + 0.05*m
-                self.transError = transErrorbk + 0.05*n
-                decodedEvents = []
-                events = self.decode()
-                for i in range(len(events)):
-                    j = max(0,i-1)
-                    fromPrevious = events[i]['sample_idx']-events[j]['sample_idx']
-                    event = events[i]['code']
-                    if(fromPrevious > self.__max_distance*self.__fsEEG*(1+self.__transError)):
-                        decodedEvents.append(-1)
-                    decodedEvents.append(event)
-                decodedEvents = np.array(decodedEvents, dtype=np.int16)
-                length = min(len(trueEvents), len(decodedEvents))
-                acc = np.sum(trueEvents[0:length] == decodedEvents[0:length])/length
-                if acc > maxAcc:
-                    maxAcc = acc
-                    outEvents = events
-
-                if maxAcc == 1:
-                    self.thrError = thrErrorbk
-                    self.transError = transErrorbk
-                    return (outEvents, maxAcc)
-
-        self.thrError = thrErrorbk
-        self.transError = transErrorbk
+        for order in sorted(results):
+            acc, events = results[order]
+            m, n = grid[order]
+            accuracySurface[m+2, n] = acc
+            if acc > maxAcc:
+                maxAcc = acc
+                outEvents = events
+            if maxAcc == 1 and not surface:
+                break
+
+        if surface:
+            return (outEvents, maxAcc, accuracySurface)
         return (outEvents, maxAcc)
 
        
@@ -260,5 +520,95 @@ class SerialTriggerDecoder:
         print('Transfer error: {}'.format(self.__transError))
 
 
-    def generateTrialTrigger():
-        print("Re-generating trigger ...")
+    @staticmethod
+    def generateTrialTrigger(numSamples, fsEEG=1000, clkSerial=16, eventRate=1.0, jitter=0, glitchRate=0.0, dropoutRate=0.0,
+                             codes=None, seed=None):
+        """Synthesises a trigger signal of numSamples samples, Manchester encoded as by the stimulus PC, for testing and benchmarking
+        the decoders. Returns (trigger, trueEvents): the 0/1 signal as int8, and the events sent as a structured array with
+        EVENT_DTYPE. sample_idx there is the first sample of the start bit; decode() reports one sample earlier, as it doesn't count
+        the first sample of the signal. The last sample is high, so the gap after the last event ends with a transition: the
+        decoders only close an event once the run after its trailing gap has started.
+        
+        eventRate is the mean number of events per second; the gaps between them are random, but never shorter than 4 clock periods.
+        Each half period is jittered by up to +/-jitter samples. glitchRate is the mean number of glitches per second: pulses of the
+        other level, shorter than MIN_GLITCH_WIDTH. dropoutRate is the mean number of dropouts per second, where the line stays low
+        for up to one event's length, so an event it hits is lost or corrupted. codes are sent in turn (repeating as needed);
+        by default they are random, from 1 to 159. seed seeds the random generator."""
+        rng = np.random.default_rng(seed)
+        nHalfPeriod = round(fsEEG/clkSerial/2)
+        eventLength = 18*nHalfPeriod #Start bit and 8 data bits, two half periods each
+        minGap = 8*nHalfPeriod
+        meanGap = max(fsEEG/eventRate - eventLength, minGap)
+        numEvents = int(numSamples/(eventLength + meanGap)) + 1
+
+        if codes is None:
+            codes = rng.integers(1, 160, numEvents)
+        else:
+            codes = np.resize(np.asarray(codes, dtype=np.int64), numEvents)
+        #Bits MSB first, after a 0 start bit. A 0 is high then low, a 1 low then high.
+        bits = np.zeros((numEvents, 9), np.int8)
+        bits[:, 1:] = (codes[:, None] >> np.arange(7, -1, -1)) & 1
+        halfLevels = np.stack([1 - bits, bits], axis=2).reshape(numEvents, 18)
+        halfLengths = np.full((numEvents, 18), nHalfPeriod, np.int64)
+        if jitter > 0:
+            halfLengths += rng.integers(-jitter, jitter + 1, (numEvents, 18))
+        gaps = minGap + rng.exponential(meanGap - minGap, numEvents).astype(np.int64) if meanGap > minGap else np.full(numEvents, minGap)
+
+        #Keep the events that end at least a minimum gap before the end of the signal
+        eventLengths = halfLengths.sum(axis=1)
+        starts = np.cumsum(gaps + eventLengths) - eventLengths
+        numEvents = int(np.searchsorted(starts + eventLengths + minGap, numSamples, side='right'))
+        if numEvents == 0:
+            return np.zeros(numSamples, np.int8), np.zeros(0, dtype=EVENT_DTYPE)
+
+        #Lay the signal out as runs - a gap, then the half periods of an event, and so on - and expand them in one go
+        levels = np.zeros((numEvents, 19), np.int8)
+        levels[:, 1:] = halfLevels[:numEvents]
+        lengths = np.empty((numEvents, 19), np.int64)
+        lengths[:, 0] = gaps[:numEvents]
+        lengths[:, 1:] = halfLengths[:numEvents]
+        trigger = np.repeat(levels.ravel(), lengths.ravel())
+        trigger = np.concatenate((trigger, np.zeros(numSamples - len(trigger), np.int8)))
+
+        for i in rng.integers(0, numSamples, rng.poisson(glitchRate*numSamples/fsEEG)):
+            width = int(rng.integers(1, SerialTriggerDecoder.MIN_GLITCH_WIDTH))
+            trigger[i:i+width] = 1 - trigger[i:i+width]
+        for i in rng.integers(0, numSamples, rng.poisson(dropoutRate*numSamples/fsEEG)):
+            trigger[i:i+int(rng.integers(1, eventLength + 1))] = 0
+        trigger[-1] = 1
+
+        trueEvents = np.zeros(numEvents, dtype=EVENT_DTYPE)
+        trueEvents['sample_idx'] = starts[:numEvents]
+        trueEvents['code'] = codes[:numEvents]
+        trueEvents['nbits'] = 8
+        trueEvents['confidence'] = 1
+        trueEvents['max_deviation'] = 0
+        return trigger, trueEvents
+
+#Run-length encoded trigger and reference codes for decodeWithRef, set once per worker process rather than sent with every setting.
+_sweepRuns = None
+_sweepTrueEvents = None
+
+def _sweepInit(levels, lengths, trueEvents):
+    global _sweepRuns, _sweepTrueEvents
+    _sweepRuns = (levels, lengths)
+    _sweepTrueEvents = trueEvents
+
+def _sweepDecode(setting):
+    #Decodes the shared trigger with one (thrError, transError) setting and returns (accuracy, events) against the reference codes.
+    fsEEG, clkSerial, thrError, transError, max_distance, min_glitch_width = setting
+    decoder = SerialTriggerDecoder(None, fsEEG, clkSerial, thrError, transError, max_trig_distance=max_distance,
+                                   min_glitch_width=min_glitch_width)
+    events = decoder.decodeRunLengths(*_sweepRuns)
+    decodedEvents = []
+    for i in range(len(events)):
+        j = max(0,i-1)
+        fromPrevious = events[i]['sample_idx']-events[j]['sample_idx']
+        event = events[i]['code']
+        if(fromPrevious > max_distance*fsEEG*(1+transError)):
+            decodedEvents.append(-1)
+        decodedEvents.append(event)
+    decodedEvents = np.array(decodedEvents, dtype=np.int16)
+    length = min(len(_sweepTrueEvents), len(decodedEvents))
+    acc = np.sum(_sweepTrueEvents[0:length] == decodedEvents[0:length])/length
+    return (acc, events)
@@ -30,13 +30,17 @@ Later modified by Chris Winnard, AIM CDT. 2025-10-27
 
 '''
 import numpy as np
+import os
 import struct
 import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tkinter as tk
 from tkinter import filedialog
 
+CHUNK_SIZE = 60000 #samples, i.e. 1 minute at 1 kHz
+
 class Poly5Reader: 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, mmap=False, read_data=True, dtype=np.float32, workers=1, progress=None):
         if filename==None:
             root = tk.Tk()
 
@@ -44,8 +48,33 @@ class Poly5Reader:
             root.withdraw()
             
         self.filename = filename
-        print('Reading file ', filename)
-        self._readFile(filename)
+        #Poly5 stores float32. Keeping that halves memory compared with float64; pass dtype=np.float64 to upcast explicitly.
+        self.dtype = np.dtype(dtype)
+        #workers > 1 splits the data blocks across a thread pool. progress, if given, is called with the fraction read so far.
+        self.workers = workers
+        self.progress = progress
+        if not read_data:
+            #Header and channel descriptions only; samples can then be fetched selectively with read().
+            self._readHeaderOnly(filename)
+        elif mmap:
+            print('Mapping file ', filename)
+            self._mapFile(filename)
+        else:
+            print('Reading file ', filename)
+            self._readFile(filename)
+        
+    @classmethod
+    def probe(cls, filename):
+        """Fast metadata check: parses only the header and channel descriptions, without touching the data blocks, and returns
+        a dict with the sample rate, channel names, number of samples (from the header), number of samples actually stored in
+        the file, start time and duration (in seconds)."""
+        reader = cls(filename, read_data=False)
+        return {'sample_rate': reader.sample_rate,
+                'channels': [ch.name for ch in reader.channels],
+                'num_samples': reader.num_samples,
+                'num_stored_samples': reader._numStoredSamples(),
+                'start_time': reader.start_time,
+                'duration': reader.num_samples/reader.sample_rate}
         
     def _readFile(self, filename):
         try:
@@ -53,26 +82,165 @@ class Poly5Reader:
             try:    
                 self._readHeader(f)
                 self.channels=self._readSignalDescription(f)
+                f.close()
                 
-                sample_buffer=np.zeros(self.num_channels*self.num_samples)
-                for i in range(self.num_data_blocks):
-                    print('\rProgress: % 0.1f %%' %(100*i/self.num_data_blocks), end="\r")
-                    i_start=i*self.num_data_blocks+1;
-                    i_end=min((i+1)*self.num_data_blocks, self.num_samples)
-                    data_block=self._readSignalBlock(f, i_end - i_start + 1)
-                    i1=i*self.num_samples_per_block*self.num_channels
-                    i2=(i+1)*self.num_samples_per_block*self.num_channels
-                    np.put(sample_buffer, range(i1, i2),data_block)
-                   
-                samples=np.transpose(np.reshape(sample_buffer, [self.num_samples_per_block*(i+1), self.num_channels]))
+                #Fill the (channels, samples) matrix chunk by chunk, so no second full-size buffer is needed. It is only kept once
+                #it has been filled, so a failed read never leaves part of it uninitialised in self.samples.
+                num_stored_samples=self._numStoredSamples()
+                samples=np.empty((self.num_channels, num_stored_samples), dtype=self.dtype)
+                if self.workers > 1:
+                    self._readParallel(samples)
+                else:
+                    i=0
+                    for chunk in self.read_chunks():
+                        samples[:, i:i+chunk.shape[1]]=chunk
+                        i+=chunk.shape[1]
+                        if self.progress is not None:
+                            self.progress(i/num_stored_samples)
                 self.samples=samples
                 print('Done reading data.')
-                f.close()
             except:
                 print('Reading data failed.')
         except:
             print('Could not open file. ')
         
+    def _mapFile(self, filename):
+        """Memory-map the data blocks instead of reading them. 'samples' is then a MappedSamples view, so nothing is copied
+        until it is indexed."""
+        try:
+            f = open(filename, "rb")
+            try:
+                self._readHeader(f)
+                self.channels=self._readSignalDescription(f)
+                f.close()
+                
+                #Only the blocks actually in the file are mapped, as a truncated file holds fewer than the header says.
+                num_stored_samples=self._numStoredSamples()
+                num_blocks=-(-num_stored_samples//self.num_samples_per_block)
+                self.data_blocks=np.memmap(filename, dtype=self._blockDtype(), mode='r', offset=self.data_offset, shape=(num_blocks,))['data']
+                self.samples=MappedSamples(self.data_blocks, num_stored_samples, self.dtype)
+                print('Done mapping data.')
+            except:
+                print('Mapping data failed.')
+        except:
+            print('Could not open file. ')
+            
+    def _readHeaderOnly(self, filename):
+        try:
+            f = open(filename, "rb")
+            try:
+                self._readHeader(f)
+                self.channels=self._readSignalDescription(f)
+            except:
+                print('Reading header failed.')
+            f.close()
+        except:
+            print('Could not open file. ')
+            
+    def read(self, channels=None, start=0, stop=None):
+        """Read only some channels and/or a sample range [start, stop) from the file, without loading the rest of it.
+        The byte offsets of the data blocks covering the range are computed from num_samples_per_block and the block size,
+        so only those blocks are read. channels is a list of channel indices, or a single index. Returns an array of shape
+        (len(channels), stop - start).
+        
+        Note that samples are interleaved across channels within each block, so selecting channels reduces what is kept
+        in memory, while selecting a sample range also reduces what is read from disk."""
+        num_stored_samples = self._numStoredSamples()
+        if channels is None:
+            channels = list(range(self.num_channels))
+        elif isinstance(channels, (int, np.integer)):
+            channels = [channels]
+        if stop is None or stop > num_stored_samples:
+            stop = num_stored_samples
+        start = max(0, min(start, stop))
+        
+        block_dtype = self._blockDtype()
+        first_block = start//self.num_samples_per_block
+        last_block = -(-stop//self.num_samples_per_block)
+        with open(self.filename, "rb") as f:
+            f.seek(self.data_offset + first_block*block_dtype.itemsize)
+            blocks = np.fromfile(f, dtype=block_dtype, count=last_block - first_block)
+            
+        data = blocks['data'][:, :, channels].reshape(-1, len(channels))
+        offset = first_block*self.num_samples_per_block
+        return np.ascontiguousarray(data[start - offset:stop - offset].T, dtype=self.dtype)
+            
+    def read_chunks(self, chunk_size=CHUNK_SIZE, channels=None):
+        """Generator yielding the data as consecutive (channels, samples) chunks, reading the file one chunk at a time so
+        that memory use does not grow with the length of the recording. chunk_size is in samples and is rounded down to a
+        whole number of data blocks; the final chunk may be shorter."""
+        if channels is None:
+            channels = list(range(self.num_channels))
+        elif isinstance(channels, (int, np.integer)):
+            channels = [channels]
+        num_stored_samples = self._numStoredSamples()
+        
+        block_dtype = self._blockDtype()
+        blocks_per_chunk = max(1, chunk_size//self.num_samples_per_block)
+        with open(self.filename, "rb") as f:
+            f.seek(self.data_offset)
+            for first_block in range(0, self.num_data_blocks, blocks_per_chunk):
+                blocks = np.fromfile(f, dtype=block_dtype, count=min(blocks_per_chunk, self.num_data_blocks - first_block))
+                if len(blocks) == 0:
+                    break
+                data = blocks['data'][:, :, channels].reshape(-1, len(channels))
+                yield np.ascontiguousarray(data[:num_stored_samples - first_block*self.num_samples_per_block].T, dtype=self.dtype)
+            
+    def channel_index(self, channel):
+        """Index of a channel given either by index or by name."""
+        if isinstance(channel, str):
+            names = [ch.name for ch in self.channels]
+            if channel not in names:
+                raise ValueError('No channel named ' + channel + ' in ' + self.filename)
+            return names.index(channel)
+        return channel
+
+    def read_trigger(self, channel, chunk_size=CHUNK_SIZE):
+        """Read one channel, by index or name, and threshold it as a trigger line: returns a uint8 array that is 1 where the
+        channel is 0. The file is read a chunk at a time and only this channel is kept, so memory use is one byte per sample.
+        As the channels are interleaved within each block, the whole file is still read from disk."""
+        channel = self.channel_index(channel)
+        trigger = np.empty(self._numStoredSamples(), dtype=np.uint8)
+        i = 0
+        for chunk in self.read_chunks(chunk_size, channels=[channel]):
+            trigger[i:i + chunk.shape[1]] = chunk[0]==0
+            i += chunk.shape[1]
+        return trigger
+
+    def _readParallel(self, samples):
+        """Split the data blocks holding the stored samples into chunk-sized ranges and read them concurrently, each worker with
+        its own file handle, straight into its slice of samples. The per-range copies are done by numpy, which releases the GIL."""
+        num_blocks = -(-samples.shape[1]//self.num_samples_per_block)
+        blocks_per_chunk = max(1, CHUNK_SIZE//self.num_samples_per_block)
+        block_ranges = [(first_block, min(blocks_per_chunk, num_blocks - first_block))
+                        for first_block in range(0, num_blocks, blocks_per_chunk)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._readBlocksInto, samples, first_block, block_count) for first_block, block_count in block_ranges]
+            blocks_done = 0
+            for future in as_completed(futures):
+                blocks_done += future.result()
+                if self.progress is not None:
+                    self.progress(blocks_done/num_blocks)
+                    
+    def _readBlocksInto(self, samples, first_block, num_blocks):
+        buffer = np.empty(num_blocks, dtype=self._blockDtype())
+        with open(self.filename, "rb") as f:
+            f.seek(self.data_offset + first_block*buffer.itemsize)
+            if f.readinto(buffer.view(np.uint8)) != buffer.nbytes:
+                raise IOError('Unexpected end of file in data block ' + str(first_block))
+        i = first_block*self.num_samples_per_block
+        data = buffer['data'].reshape(-1, self.num_channels)[:samples.shape[1] - i]
+        samples[:, i:i+len(data)] = data.T
+        return num_blocks
+            
+    def _numStoredSamples(self):
+        # The last data block may be padded beyond num_samples, and a truncated file holds fewer whole blocks than the header says.
+        num_blocks = min(self.num_data_blocks, (os.path.getsize(self.filename) - self.data_offset)//self._blockDtype().itemsize)
+        return min(self.num_samples, num_blocks*self.num_samples_per_block)
+            
+    def _blockDtype(self):
+        # Each data block is an 86-byte block header followed by num_samples_per_block interleaved float32 samples per channel.
+        return np.dtype([('header', 'V86'), ('data', '<f4', (self.num_samples_per_block, self.num_channels))])
             
     def _readHeader(self, f):
         header_data=struct.unpack("=31sH81phhBHi4xHHHHHHHiHHH64x", f.read(217))
@@ -113,18 +281,61 @@ class Poly5Reader:
             ch.cache_offset = channel_description[7]
             chan_list.append(ch)
             f.read(136)
+        self.data_offset=f.tell()
         return chan_list
         
             
     
-    def _readSignalBlock(self, f, n):
-        f.read(86)
-        buffer_size=self.num_channels*self.num_samples_per_block
-        sampleData=f.read(buffer_size*4)
-        DataBlock=struct.unpack((str(buffer_size) + 'f'), sampleData)
-        SignalBlock=np.asarray(DataBlock)
-        return SignalBlock
+
+class MappedSamples:
+    """ 'MappedSamples' is a read-only (channels, samples) view on the data blocks of a memory-mapped Poly5 file. It is
+        indexed like the 'samples' array of Poly5Reader, e.g. samples[35, :], and only the requested values are copied out of
+        the file. np.asarray(samples) materialises the whole matrix.
+
+        shape : '(num_channels, num_samples)'
+
+        dtype : dtype of the arrays returned by indexing (float32 by default, as stored in the file)
+    """
+
+    def __init__(self, data_blocks, num_samples, dtype=np.float32):
+        self.data_blocks = data_blocks
+        self.num_samples_per_block = data_blocks.shape[1]
+        self.shape = (data_blocks.shape[2], min(num_samples, data_blocks.shape[0]*data_blocks.shape[1]))
+        self.dtype = np.dtype(dtype)
+        self.ndim = 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        if len(key) != 2:
+            raise IndexError('MappedSamples is indexed as [channels, samples].')
+        ch_key, t_key = key
         
+        first_block = 0
+        if isinstance(t_key, slice) and t_key.step in (None, 1):
+            #Only touch the data blocks that overlap the requested samples.
+            start, stop, step = t_key.indices(self.shape[1])
+            stop = max(start, stop)
+            first_block = start//self.num_samples_per_block
+            last_block = -(-stop//self.num_samples_per_block)
+            data = self.data_blocks[first_block:last_block, :, ch_key]
+            t_key = slice(start - first_block*self.num_samples_per_block, stop - first_block*self.num_samples_per_block)
+        else:
+            data = self.data_blocks[:, :, ch_key]
+            
+        data = np.moveaxis(data.reshape((-1,) + data.shape[2:]), 0, -1)
+        data = data[..., :self.shape[1] - first_block*self.num_samples_per_block]
+        return data[..., t_key].astype(self.dtype, copy=False)
+
+    def __array__(self, dtype=None, copy=None):
+        samples = self[:, :]
+        if dtype is not None:
+            samples = samples.astype(dtype)
+        return samples
+
 
 class Channel:
     """ 'Channel' represents a device channel. It has the next properties:
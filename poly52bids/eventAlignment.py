@@ -0,0 +1,247 @@
+import numpy as np
+
+"""Aligns two decoded event streams from the same session, e.g. the scalp and cEEGrid recordings, which should each have every
+trigger but may miss one or pick up an extra one. Events are paired on their timing since the last paired events (so the recordings'
+different start times and slow clock drift don't matter) and then compared on their codes, in a two-pointer pass each way from a
+starting pair found over the whole of both streams. If the streams fall out of step, e.g. after a jump in one clock, a new starting
+pair is found for the rest. Unlike comparing the streams index by index, a missing trigger is reported as just that, and the events
+after it still line up.
+
+The alignment can also be used to fit the clock offset and drift between the two devices (see fitClockDrift), and to build a
+corrected event list for one stream from the other (see correctEvents)."""
+
+#Kinds of aligned pairs:
+ALIGN_MATCH = 0 #Event in both streams, same code
+ALIGN_MISMATCH = 1 #Event in both streams (same timing), different codes
+ALIGN_ONLY_1 = 2 #Event only in the first stream, i.e. missing from the second
+ALIGN_ONLY_2 = 3 #Event only in the second stream
+
+ALIGNMENT_DTYPE = np.dtype([('index1', np.int64), #Index of the event in each stream, -1 if it's missing from that stream
+                            ('index2', np.int64),
+                            ('kind', np.int8)])
+
+TOLERANCE = 20 #samples. Triggers are several hundred ms apart, so this only needs to cover jitter and drift between events
+MAX_DRIFT_PPM = 100 #Largest relative drift between the two clocks. The tolerance grows by this much of the time since the last pair
+RESYNC_EVENTS = 4 #After this many unpaired events in a row the streams are out of step, and a new starting pair is found
+SEARCH_BAND = 100 #Starting pairs are only looked for among events at most this many places apart in their streams
+OUTLIER_THRESHOLD = 4 #Pairs further than this many robust SDs from the clock fit are left out of it
+MIN_RESIDUAL_SCALE = 1 #samples. Floor for the robust SD, which can be 0 as latencies are whole samples
+
+def _startingPair(codes1, latencies1, codes2, latencies2, tolerance, band=SEARCH_BAND):
+    #Indices of the earliest same-code pair of events whose offset (latencies2 - latencies1) is in the tolerance-wide window of
+    #offsets holding the most same-code pairs, over the whole of both streams, or None if no such pairs are found. Only events at
+    #most band places apart are paired, so there are at most len(codes1)*(2*band + 1) candidate pairs, rather than the square of
+    #the number of events with each code. One stream can then miss up to band more events than the other before the starting pair.
+    pairs1, pairs2 = [], []
+    for code in np.intersect1d(codes1, codes2):
+        indices1, indices2 = np.flatnonzero(codes1==code), np.flatnonzero(codes2==code)
+        first = np.searchsorted(indices2, indices1 - band)
+        counts = np.searchsorted(indices2, indices1 + band, side='right') - first
+        pairs1.append(np.repeat(indices1, counts))
+        pairs2.append(indices2[np.arange(counts.sum()) + np.repeat(first - np.cumsum(counts) + counts, counts)])
+    if sum(len(pairs) for pairs in pairs1)==0:
+        return None
+    pairs1, pairs2 = np.concatenate(pairs1), np.concatenate(pairs2)
+    offsets = latencies2[pairs2] - latencies1[pairs1]
+    sortedOffsets = np.sort(offsets)
+    counts = np.searchsorted(sortedOffsets, sortedOffsets + tolerance, side='right') - np.arange(len(sortedOffsets))
+    low = sortedOffsets[np.argmax(counts)]
+    inWindow = np.flatnonzero((offsets >= low) & (offsets <= low + tolerance))
+    first = inWindow[np.lexsort((pairs2[inWindow], pairs1[inWindow]))[0]]
+    return pairs1[first], pairs2[first]
+
+def _merge(latencies1, latencies2, anchor1, anchor2, tolerance):
+    #Two-pointer pass over both streams, with the times since the last pair measured from anchor1 and anchor2 to start with, and
+    #the tolerance growing by MAX_DRIFT_PPM of that time. Returns (index1, index2) for each pair or unpaired event, with -1 for a
+    #missing event, and the numbers of events of each stream it covers. It stops at the end of either stream, or before a run of
+    #RESYNC_EVENTS unpaired events.
+    n1, n2 = len(latencies1), len(latencies2)
+    entries = []
+    i = j = unpaired = 0
+    while i < n1 and j < n2 and unpaired < RESYNC_EVENTS:
+        t1 = latencies1[i] - anchor1
+        t2 = latencies2[j] - anchor2
+        if abs(t1 - t2) <= tolerance + MAX_DRIFT_PPM*1e-6*abs(t1):
+            entries.append((i, j))
+            anchor1, anchor2 = latencies1[i], latencies2[j]
+            i += 1
+            j += 1
+            unpaired = 0
+        elif t1 < t2:
+            entries.append((i, -1))
+            i += 1
+            unpaired += 1
+        else:
+            entries.append((-1, j))
+            j += 1
+            unpaired += 1
+    if unpaired==RESYNC_EVENTS:
+        run = entries[len(entries) - unpaired:]
+        entries = entries[:len(entries) - unpaired]
+        i -= sum(k >= 0 for k, _ in run)
+        j -= sum(l >= 0 for _, l in run)
+    return entries, i, j
+
+def alignEvents(codes1, latencies1, codes2, latencies2, tolerance=TOLERANCE):
+    """Aligns two event streams, each given as codes and latencies (in samples, at the same rate). Two events are paired if their
+    times since the previous pair agree to within tolerance samples, plus MAX_DRIFT_PPM of that time, whatever their codes. The
+    first pair is the earliest one with the same code at the offset between the streams shared by the most same-code pairs, so
+    either stream can miss up to SEARCH_BAND events at the start. After RESYNC_EVENTS unpaired events in a row, the rest of the
+    streams are aligned again from a new starting pair. Returns an ALIGNMENT_DTYPE array, in time order, with one entry per pair
+    or unpaired event."""
+    codes1, codes2 = np.asarray(codes1, dtype=np.int64), np.asarray(codes2, dtype=np.int64)
+    latencies1, latencies2 = np.asarray(latencies1, dtype=np.int64), np.asarray(latencies2, dtype=np.int64)
+
+    #Each part of the streams still to align is (first1, end1, first2, end2). Aligning one leaves the events before its starting
+    #pair and after its passes to align, and the aligned entries are put back in time order at the end.
+    pieces = []
+    parts = [(0, len(codes1), 0, len(codes2))]
+    while len(parts) > 0:
+        first1, end1, first2, end2 = parts.pop()
+        if first1==end1 or first2==end2:
+            pieces.append(((first1, first2), [(k, -1) for k in range(first1, end1)] + [(-1, k) for k in range(first2, end2)]))
+            continue
+        start = _startingPair(codes1[first1:end1], latencies1[first1:end1], codes2[first2:end2], latencies2[first2:end2], tolerance)
+        if start==None:
+            start = (0, 0) #Nothing to go on but the first events
+        i, j = first1 + start[0], first2 + start[1]
+        #The events before the starting pair are aligned backwards from it, i.e. forwards on the reversed, negated latencies
+        before, k, l = _merge(-latencies1[first1:i][::-1], -latencies2[first2:j][::-1], -latencies1[i], -latencies2[j], tolerance)
+        before = [(i - 1 - m if m >= 0 else -1, j - 1 - n if n >= 0 else -1) for m, n in reversed(before)]
+        after, m, n = _merge(latencies1[i+1:end1], latencies2[j+1:end2], latencies1[i], latencies2[j], tolerance)
+        after = [(i + 1 + p if p >= 0 else -1, j + 1 + q if q >= 0 else -1) for p, q in after]
+        pieces.append(((i - k, j - l), before + [(i, j)] + after))
+        parts += [(first1, i - k, first2, j - l), (i + 1 + m, end1, j + 1 + n, end2)]
+    entries = [entry for _, piece in sorted(pieces, key=lambda piece: piece[0]) for entry in piece]
+
+    alignment = np.zeros(len(entries), dtype=ALIGNMENT_DTYPE)
+    if len(entries) > 0:
+        alignment['index1'], alignment['index2'] = zip(*entries)
+    index1, index2 = alignment['index1'], alignment['index2']
+    paired = (index1 >= 0) & (index2 >= 0)
+    alignment['kind'][index1 < 0] = ALIGN_ONLY_2
+    alignment['kind'][index2 < 0] = ALIGN_ONLY_1
+    alignment['kind'][paired] = np.where(codes1[index1[paired]]==codes2[index2[paired]], ALIGN_MATCH, ALIGN_MISMATCH)
+    return alignment
+
+def printAlignmentReport(alignment, codes1, latencies1, codes2, latencies2, names=("first", "second")):
+    """Prints each event that is missing from one stream or has different codes in the two, then a summary. names are the names
+    of the two streams, e.g. ("scalp", "ceegrid")."""
+    for index1, index2, kind in alignment:
+        if kind==ALIGN_MISMATCH:
+            print("WARNING - EVENT CODES DISCREPENCY: " + names[0] + " event " + str(index1+1) + " (sample " + str(latencies1[index1])
+                  + ") has code " + str(codes1[index1]) + ", but " + names[1] + " event " + str(index2+1) + " (sample "
+                  + str(latencies2[index2]) + ") has code " + str(codes2[index2]))
+        elif kind==ALIGN_ONLY_1:
+            print("WARNING - " + names[0] + " event " + str(index1+1) + " (code " + str(codes1[index1]) + ", sample "
+                  + str(latencies1[index1]) + ") is missing from the " + names[1] + " data")
+        elif kind==ALIGN_ONLY_2:
+            print("WARNING - " + names[1] + " event " + str(index2+1) + " (code " + str(codes2[index2]) + ", sample "
+                  + str(latencies2[index2]) + ") is missing from the " + names[0] + " data")
+
+    kinds = alignment['kind']
+    paired = np.count_nonzero(kinds <= ALIGN_MISMATCH)
+    print(str(np.count_nonzero(kinds==ALIGN_MATCH)) + " out of " + str(paired) + " paired events have the same code in both data files. "
+          + str(np.count_nonzero(kinds==ALIGN_ONLY_1)) + " " + names[0] + " events are missing from the " + names[1] + " data, and "
+          + str(np.count_nonzero(kinds==ALIGN_ONLY_2)) + " " + names[1] + " events are missing from the " + names[0] + " data.")
+
+def fitClockDrift(alignment, latencies1, latencies2, threshold=OUTLIER_THRESHOLD, maxIterations=10):
+    """Fits latencies2 = offset + slope*latencies1 to the paired events of an alignment, i.e. the offset and drift between the two
+    devices' clocks, by least squares. Pairs with residuals over threshold robust SDs (from the median absolute deviation) are
+    left out and the fit repeated, until the pairs left out don't change. Raises ValueError with fewer than two pairs.
+
+    Returns a dict with 'map' (a function from stream 1 latencies to stream 2 latencies, in samples, as floats), 'offset', 'slope',
+    'driftPpm' (clock drift in parts per million), 'residuals' (samples, for every pair), 'inliers' (a mask of the pairs used),
+    'rmsResidual' and 'maxResidual' (over the pairs used) and 'numOutliers'."""
+    paired = alignment[alignment['kind'] <= ALIGN_MISMATCH]
+    if len(paired) < 2:
+        raise ValueError("At least two paired events are needed to fit the clock drift, found " + str(len(paired)))
+    x = np.asarray(latencies1, dtype=np.float64)[paired['index1']]
+    y = np.asarray(latencies2, dtype=np.float64)[paired['index2']]
+    x0 = x.mean() #Centred, for a well-conditioned fit
+
+    inliers = np.ones(len(x), dtype=bool)
+    for _ in range(maxIterations):
+        slope, intercept = np.polyfit(x[inliers] - x0, y[inliers], 1)
+        residuals = y - (intercept + slope*(x - x0))
+        scale = max(1.4826*np.median(np.abs(residuals[inliers] - np.median(residuals[inliers]))), MIN_RESIDUAL_SCALE)
+        newInliers = np.abs(residuals) <= threshold*scale
+        if np.count_nonzero(newInliers) < 2 or np.array_equal(newInliers, inliers):
+            break
+        inliers = newInliers
+    else:
+        slope, intercept = np.polyfit(x[inliers] - x0, y[inliers], 1)
+        residuals = y - (intercept + slope*(x - x0))
+
+    offset = intercept - slope*x0
+    return {'map': lambda latencies: offset + slope*np.asarray(latencies, dtype=np.float64),
+            'offset': offset,
+            'slope': slope,
+            'driftPpm': (slope - 1)*1e6,
+            'residuals': residuals,
+            'inliers': inliers,
+            'rmsResidual': np.sqrt(np.mean(residuals[inliers]**2)),
+            'maxResidual': np.max(np.abs(residuals[inliers])),
+            'numOutliers': len(x) - np.count_nonzero(inliers)}
+
+def printClockFit(clockFit, names=("first", "second")):
+    """Prints the offset, drift and residuals of a fitClockDrift result."""
+    print(names[1] + " clock vs " + names[0] + ": offset " + str(round(clockFit['offset'])) + " samples, drift "
+          + str(round(clockFit['driftPpm'], 1)) + " ppm. Residuals: RMS " + str(round(clockFit['rmsResidual'], 2)) + ", max "
+          + str(round(clockFit['maxResidual'], 2)) + " samples; " + str(clockFit['numOutliers']) + " pairs left out as outliers.")
+
+def correctEvents(alignment, codes1, latencies1, codes2, latencies2, dropExtra=False, clockFit=None):
+    """Corrects the second stream using the first as the reference: events missing from it are added, at the first stream's
+    latency mapped by clockFit (from fitClockDrift) if given, or otherwise shifted by the offset between the streams at the nearest
+    pair, and codes that differ are replaced by the first stream's. Events only in the second stream are kept, unless dropExtra. Returns the corrected codes and latencies (lists of ints),
+    e.g. for writeCorrectionsFile. To correct the first stream instead, align the streams the other way round."""
+    #A trailing 0 is added to each, which is what index -1 (a missing event) picks
+    codes1, codes2 = np.append(np.asarray(codes1, dtype=np.int64), 0), np.append(np.asarray(codes2, dtype=np.int64), 0)
+    latencies1, latencies2 = np.append(np.asarray(latencies1, dtype=np.int64), 0), np.append(np.asarray(latencies2, dtype=np.int64), 0)
+    index1, index2, kinds = alignment['index1'], alignment['index2'], alignment['kind']
+
+    #Offset at each entry: that of the last pair before it, or the first pair after it at the start
+    paired = np.flatnonzero(kinds <= ALIGN_MISMATCH)
+    if len(paired)==0:
+        offsets = np.zeros(len(alignment), dtype=np.int64)
+    else:
+        pairOffsets = latencies2[index2[paired]] - latencies1[index1[paired]]
+        offsets = pairOffsets[np.clip(np.searchsorted(paired, np.arange(len(alignment)), side='right') - 1, 0, None)]
+    if clockFit!=None:
+        offsets = np.round(clockFit['map'](latencies1[index1])).astype(np.int64) - latencies1[index1]
+
+    keep = (kinds!=ALIGN_ONLY_2) | (not dropExtra)
+    fromFirst = kinds==ALIGN_ONLY_1
+    codes = np.where(kinds==ALIGN_ONLY_2, codes2[index2], codes1[index1])
+    latencies = np.where(fromFirst, latencies1[index1] + offsets, latencies2[index2])
+    order = np.argsort(latencies[keep], kind='stable')
+    return codes[keep][order].tolist(), latencies[keep][order].tolist()
+
+def writeCorrectionsFile(path, codes, latencies):
+    """Writes events in the format of the trigger corrections .txt files read by the poly52trigs versions with corrections: a header
+    line, then the code and latency (in samples) of each event."""
+    with open(path, 'w') as f:
+        f.write("\n".join(["code\tlatency"] + [str(code) + "\t" + str(latency) for code, latency in zip(codes, latencies)]) + "\n")
+
+def loadCorrectionsFile(path):
+    """Reads a trigger corrections .txt file (see writeCorrectionsFile) in one pass. Returns the codes and latencies (in samples) as
+    int64 arrays. Raises ValueError if the file can't be parsed, or if a code isn't 1-255, a latency is negative or the latencies
+    aren't in order."""
+    try:
+        table = np.loadtxt(path, dtype=np.int64, skiprows=1, usecols=(0, 1), ndmin=2)
+    except ValueError as e:
+        raise ValueError("Could not read trigger corrections file " + path + ": " + str(e))
+    codes, latencies = table[:, 0], table[:, 1]
+
+    #Line numbers in the file, for the errors (after the header line)
+    badCodes = np.flatnonzero((codes < 1) | (codes > 255))
+    if len(badCodes) > 0:
+        raise ValueError(path + ", line " + str(badCodes[0] + 2) + ": code " + str(codes[badCodes[0]]) + " is not 1-255")
+    badLatencies = np.flatnonzero(latencies < 0)
+    if len(badLatencies) > 0:
+        raise ValueError(path + ", line " + str(badLatencies[0] + 2) + ": latency " + str(latencies[badLatencies[0]]) + " is negative")
+    outOfOrder = np.flatnonzero(np.diff(latencies) < 0)
+    if len(outOfOrder) > 0:
+        raise ValueError(path + ", line " + str(outOfOrder[0] + 3) + ": latency " + str(latencies[outOfOrder[0] + 1])
+                         + " is before that of the previous event")
+    return codes, latencies
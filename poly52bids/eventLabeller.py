@@ -0,0 +1,225 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+"""Labels decoded trigger events for the BIDS events files: for each event, its onset, duration, value (code), significance and
+trial. The rules for each part of the experiment are in the TASKS table below, and each part is labelled with a few array
+operations over its events rather than an event-by-event loop.
+
+Significance is kept from the previous event when a code doesn't match any rule (as the original loops did), including from the end
+of the previous part."""
+
+OB_DURATION = "0.49197278911" #seconds
+ONSET_DECIMALS = 6 #Onsets are written rounded to this many decimals (1us), which drops float noise such as 72.44800000000032
+
+#For each task (part of the experiment):
+#-startCodes/endCodes: codes marking the start/end of a trial. otherCodes: significance of any other codes within trials.
+#-mainStart/mainEnd: codes marking the start/end of the main trials.
+#-practice: "single" for one practice trial, which ends at the first code that isn't a trial start; "numbered" for numbered practice
+# trials (prac_1, prac_2, ...), which run until mainStart.
+#-durations: duration of events of a given significance ("0" otherwise).
+#-onsetShifts: seconds to subtract from the onsets of the given codes.
+#-endAtLastEvent: whether the part may end with the recording, without mainEnd.
+TASKS = {"emotion": {"startCodes": np.arange(1, 73, 2),
+                     "endCodes": np.arange(2, 74, 2),
+                     "otherCodes": {},
+                     "mainStart": 154,
+                     "mainEnd": 155,
+                     "practice": "single",
+                     "durations": {},
+                     "onsetShifts": {46: 0.043}, #These trials were about 42.7ms too long due to an error in expt setup. For
+                     #simplicity/consistency we trim the difference by moving end trigs forward.
+                     "endAtLastEvent": False},
+         "attnMultInstOBs": {"startCodes": np.arange(73, 144, 2),
+                             "endCodes": np.arange(74, 145, 2),
+                             "otherCodes": {"attended_OB": np.array([145, 149, 153]),
+                                            "unattended_OB": np.array([146, 147, 148, 150, 151, 152])},
+                             "mainStart": 156,
+                             "mainEnd": 157,
+                             "practice": "numbered",
+                             "durations": {"attended_OB": OB_DURATION, "unattended_OB": OB_DURATION},
+                             "onsetShifts": {},
+                             "endAtLastEvent": False},
+         "attnOneInstNoOBs": {"startCodes": np.arange(1, 73, 2),
+                              "endCodes": np.arange(2, 74, 2),
+                              "otherCodes": {},
+                              "mainStart": 158,
+                              "mainEnd": 159,
+                              "practice": "single",
+                              "durations": {},
+                              "onsetShifts": {46: 0.043},
+                              "endAtLastEvent": True}}
+
+PART_TASKS = ["emotion", "attnMultInstOBs", "attnOneInstNoOBs"]
+
+def labelTask(codes, latencies, task, sfreq, filterBufferPeriod, first=0, significance=None, earlyStop=None, lateStart=None,
+              firstTrial=1, finalCode=None):
+    """Labels the events of one task, starting from event index first. latencies are in samples. Onsets are relative to the first
+    event, plus filterBufferPeriod. significance is that of the event before first, kept for events with unmatched codes.
+
+    Options for recordings that don't cover the whole task:
+    -earlyStop: time (s) after which the recording is unusable. The first main-trial event after earlyStop + filterBufferPeriod is
+     replaced by a mainEnd event at earlyStop, which ends the task; the real mainEnd code isn't used.
+    -lateStart: time (s) before which the recording is unusable. Events up to then are skipped, and a mainStart event is added at the
+     start, so there are no practice trials; the real mainStart code isn't used. Trials are numbered from firstTrial.
+    -finalCode: the task also ends at the first event with this code.
+
+    Returns a dict with the columns 'onset', 'duration', 'value', 'significance' and 'trial' (as lists), 'startLatency' and
+    'endLatency' (the task's start and end in the recording, in seconds, including filterBufferPeriod), and 'next', the index of the
+    event after the task."""
+    spec = TASKS[task]
+    codes = np.asarray(codes, dtype=np.int64)[first:]
+    times = np.asarray(latencies)[first:]/sfreq
+
+    prefix = {'onset': [], 'duration': [], 'value': [], 'significance': [], 'trial': []}
+    if lateStart!=None:
+        skip = np.flatnonzero(times > lateStart)[0]
+        codes, times, first = codes[skip:], times[skip:], first + skip
+        startLatency = lateStart - filterBufferPeriod
+        prefix = {'onset': [float(filterBufferPeriod)], 'duration': ["0"], 'value': [spec["mainStart"]],
+                  'significance': ["main_trials_start"], 'trial': ["N/A"]}
+        significance = "main_trials_start"
+        practice = None
+    else:
+        startLatency = times[0] - filterBufferPeriod
+        practice = spec["practice"]
+
+    n = len(codes)
+    index = np.arange(n)
+    onsets = times - startLatency
+    for code, shift in spec["onsetShifts"].items():
+        onsets[codes==code] -= shift
+    isStart = np.isin(codes, spec["startCodes"])
+    isEnd = np.isin(codes, spec["endCodes"])
+
+    labels = np.full(n, None, dtype=object) #Significance, or None to keep the previous one
+    trials = np.full(n, "N/A", dtype=object)
+    values = codes.astype(object)
+
+    #Practice trials, and which events are main-trial events
+    if practice=="single":
+        notStart = np.flatnonzero(~isStart)
+        practiceEnd = notStart[0] if len(notStart) > 0 else n
+        inPractice = index <= practiceEnd
+        labels[inPractice & isStart] = "trial_start"
+        labels[practiceEnd:practiceEnd+1] = "trial_end"
+        trials[inPractice] = "prac"
+        inMain = ~inPractice
+    elif practice=="numbered":
+        isMainStart = codes==spec["mainStart"]
+        mainStarts = np.flatnonzero(isMainStart)
+        inPractice = index < (mainStarts[0] if len(mainStarts) > 0 else n)
+        _labelTrials(labels, trials, inPractice, codes, isStart, isEnd, spec, 1, "prac_")
+        inMain = ~inPractice
+    else:
+        inMain = np.ones(n, dtype=bool)
+
+    #Sentinels. A numbered task's mainStart counts anywhere; otherwise sentinels only count in the main trials.
+    if practice=="numbered":
+        labels[isMainStart] = "main_trials_start"
+        inMain &= ~isMainStart
+    elif lateStart==None:
+        isMainStart = inMain & (codes==spec["mainStart"])
+        labels[isMainStart] = "main_trials_start"
+        inMain &= ~isMainStart
+    if earlyStop!=None:
+        isMainEnd = inMain & (onsets + startLatency > earlyStop + filterBufferPeriod)
+        isMainEnd &= index <= (np.flatnonzero(isMainEnd)[0] if isMainEnd.any() else -1) #Only the first one is used
+        onsets[isMainEnd] = earlyStop - startLatency
+        values[isMainEnd] = spec["mainEnd"]
+    else:
+        isMainEnd = inMain & (codes==spec["mainEnd"])
+    labels[isMainEnd] = "main_trials_end"
+    inMain &= ~isMainEnd
+    _labelTrials(labels, trials, inMain, codes, isStart, isEnd, spec, firstTrial, "")
+
+    #Carry the significance forward over unmatched codes
+    lastLabelled = np.maximum.accumulate(np.where(labels!=None, index, -1))
+    significances = np.where(lastLabelled >= 0, labels[lastLabelled], significance)
+
+    #The task ends at the first main_trials_end, or at finalCode or the last event if allowed
+    ends = np.flatnonzero(significances=="main_trials_end")[:1].tolist()
+    if finalCode!=None:
+        ends += np.flatnonzero(codes==finalCode)[:1].tolist()
+    if spec["endAtLastEvent"]:
+        ends.append(n - 1)
+    if len(ends)==0 or n==0:
+        raise ValueError("No end found for task " + task + " after event " + str(first))
+    last = min(ends)
+
+    durations = [spec["durations"].get(s, "0") for s in significances[:last+1]]
+    if earlyStop!=None:
+        endLatency = earlyStop + filterBufferPeriod
+    else:
+        endLatency = onsets[last] + startLatency + filterBufferPeriod
+
+    return {'onset': prefix['onset'] + onsets[:last+1].tolist(),
+            'duration': prefix['duration'] + durations,
+            'value': prefix['value'] + [int(v) for v in values[:last+1]],
+            'significance': prefix['significance'] + significances[:last+1].tolist(),
+            'trial': prefix['trial'] + trials[:last+1].tolist(),
+            'startLatency': startLatency,
+            'endLatency': endLatency,
+            'next': first + last + 1}
+
+def _labelTrials(labels, trials, mask, codes, isStart, isEnd, spec, firstTrial, trialPrefix):
+    #Labels the trial events in mask, numbering trials from firstTrial. A trial's number goes up after its end code.
+    labels[mask & isStart] = "trial_start"
+    for significance, otherCodes in spec["otherCodes"].items():
+        labels[mask & np.isin(codes, otherCodes)] = significance
+    labels[mask & isEnd] = "trial_end"
+    trialEnds = mask & isEnd
+    trialNumbers = firstTrial + np.cumsum(trialEnds) - trialEnds
+    trials[mask] = [trialPrefix + str(number) for number in trialNumbers[mask]]
+
+def lastTrialEndCode(codes, task):
+    """The last trial end code of task in codes, e.g. where a recording of extra data stops."""
+    trialEnds = np.asarray(codes)[np.isin(codes, TASKS[task]["endCodes"])]
+    return int(trialEnds[-1])
+
+def formatOnsets(onsets):
+    """Onsets (s) as strings, rounded to ONSET_DECIMALS, in the shortest form that reads back to the same value (e.g. "1.0", "72.448")."""
+    return [np.format_float_positional(onset, precision=ONSET_DECIMALS, unique=True, fractional=True, trim='0')
+            for onset in np.round(np.asarray(onsets, dtype=np.float64), ONSET_DECIMALS)]
+
+def writeEventsTsv(path, events):
+    """Writes labelled events (as returned by labelTask) to a BIDS events .tsv file. The columns are formatted as a whole and
+    written with a single call."""
+    #An event before any recognised code has no significance (None), which is written as an empty field
+    columns = [formatOnsets(events['onset']), events['duration'], [str(value) for value in events['value']],
+               ["" if significance==None else significance for significance in events['significance']],
+               [str(trial) for trial in events['trial']]]
+    rows = ["\t".join(row) for row in zip(*columns)]
+    with open(path, 'w', newline='') as tsvfile:
+        tsvfile.write("\n".join(["onset\tduration\tvalue\tsignificance\ttrial"] + rows) + "\n")
+
+def writeEventsFiles(eventsFiles, workers=None):
+    """Writes several events files, given as {path: events}, e.g. the scalp and cEEGrid files of a participant. They are written
+    concurrently by workers threads (one per file by default); workers=1 writes them in turn."""
+    if workers==None:
+        workers = max(1, len(eventsFiles))
+    if workers==1:
+        for path, events in eventsFiles.items():
+            writeEventsTsv(path, events)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(writeEventsTsv, path, events) for path, events in eventsFiles.items()]:
+            future.result()
+
+def labelPartEvents(outputDir, subjFolder, acq, codes, latencies, sfreq, filterBufferPeriod, taskOptions={}):
+    """Labels the three parts of the experiment in turn. taskOptions gives extra labelTask arguments for any task. Returns the
+    events of each part as {path: events}, for writeEventsFiles, with paths <outputDir><subjFolder>_task-<task>_acq-<acq>_events.tsv,
+    and the start and end latencies (s) of each part, stacked as [starts, ends]."""
+    first = 0
+    significance = None
+    eventsFiles = {}
+    startLatencies = []
+    endLatencies = []
+    for task in PART_TASKS:
+        events = labelTask(codes, latencies, task, sfreq, filterBufferPeriod, first=first, significance=significance,
+                           **taskOptions.get(task, {}))
+        eventsFiles[outputDir + subjFolder + "_task-" + task + "_acq-" + acq + "_events.tsv"] = events
+        first = events['next']
+        significance = events['significance'][-1]
+        startLatencies.append(events['startLatency'])
+        endLatencies.append(events['endLatency'])
+    return eventsFiles, np.stack([startLatencies, endLatencies])
@@ -1,5 +1,10 @@
 from TMSiSDK_poly5Reader import *
 from SerialTriggerDecoder import *
+from poly5Cache import *
+import numpy as np
+import os
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 class EEGData:
     def __init__(self):
@@ -8,19 +13,34 @@ class EEGData:
         self.sample_rate = None
         self.num_samples = 0
         self.samples = None        
+        self.trigger = None
         self.num_channels = 0
         self.channels = []
         self.raw_events = None
+        self.events = None
+        self.suspect_samples = None
 
     def addChannel(self, name, unit_name, channel_type='EEG'):
         ch = Channel(name, unit_name, channel_type)
         self.channels.append(ch)
         
-    def decode_events(self, triggerClk=8, thrError=-0.3, transError=0.1):
-        self.trigger = (self.samples[35, :]==0).astype(int)
+    def decode_events(self, triggerClk=8, thrError=-0.3, transError=0.1, triggerChannel=35):
+        #self.trigger is kept as a RunLengthTrigger, a few KB rather than a value per sample
+        if self.samples is not None:
+            self.trigger = RunLengthTrigger.fromArray(self.samples[triggerChannel, :]==0)
+        #Otherwise the trigger was read on its own, by poly52POPO with triggerChannel, or set directly (as an array or RunLengthTrigger)
         decoder = SerialTriggerDecoder(self.trigger, self.sample_rate, triggerClk, thrError, transError)
         self.raw_events = decoder.decode()
+        self.events = eventsToArray(self.raw_events) #Same events as a structured array, for array-based filtering
+        self.suspect_samples = suspectSamples(self.events) #Events with warnings or low confidence, worth checking by hand
         print('number of events: ', len(self.raw_events))
+
+    def save_trigger(self, path):
+        """Saves the trigger runs to path (a .npz file), e.g. next to the events files, so it can be re-decoded later by loading it with
+        RunLengthTrigger.load into self.trigger."""
+        if not isinstance(self.trigger, RunLengthTrigger):
+            self.trigger = RunLengthTrigger.fromArray(self.trigger)
+        self.trigger.save(path)
             
 class Channel:
     """ 'Channel' represents a device channel. It has the next properties:
@@ -38,10 +58,46 @@ class Channel:
         self.unit_name = unit_name
         self.ch_type = ch_type
 
-def poly52POPO(poly5_path, name=None): #Converts into a Plain Old Python Object
+def _applyMetadata(eeg, name, metadata):
+    #Fills eeg from the metadata stored with a cache entry
+    eeg.name = name if name!=None else metadata['name']
+    eeg.start_time = datetime.datetime.fromisoformat(metadata['start_time'])
+    eeg.sample_rate = metadata['sample_rate']
+    eeg.num_samples = metadata['num_samples']
+    eeg.num_channels = metadata['num_channels']
+    for ch_name, unit_name in metadata['channels']:
+        eeg.addChannel(ch_name, unit_name)
+
+def poly52POPO(poly5_path, name=None, mmap=False, dtype=np.float32, workers=1, cacheDir=None, triggerChannel=None): #Converts into a Plain Old Python Object
+    #mmap=True maps the file rather than reading it, so eeg.samples is a lazy, zero-copy view.
+    #Samples are kept as float32, as stored in the file; pass dtype=np.float64 to upcast. workers > 1 reads blocks in parallel.
+    #If cacheDir is given, decoded samples are cached there (see poly5Cache.py) and memory-mapped on later runs.
+    #If triggerChannel (an index or name) is given, only that channel is kept, thresholded into eeg.trigger (a RunLengthTrigger) for
+    #decode_events, and eeg.samples is None. With cacheDir, only the trigger runs are then cached.
     eeg = EEGData()
+    if cacheDir!=None and triggerChannel!=None:
+        cached = poly5TriggerCacheLoad(poly5_path, cacheDir, triggerChannel)
+        if cached!=None:
+            eeg.trigger, metadata = cached
+            _applyMetadata(eeg, name, metadata)
+            return eeg
+    if cacheDir!=None:
+        cached = poly5CacheLoad(poly5_path, cacheDir, dtype)
+        if cached!=None:
+            samples, metadata = cached
+            _applyMetadata(eeg, name, metadata)
+            eeg.samples = samples
+            if triggerChannel!=None:
+                if isinstance(triggerChannel, str):
+                    triggerChannel = [ch.name for ch in eeg.channels].index(triggerChannel)
+                eeg.trigger = RunLengthTrigger.fromArray(samples[triggerChannel, :]==0)
+                eeg.samples = None
+            return eeg
+        
     try:
-        data = Poly5Reader(poly5_path)
+        data = Poly5Reader(poly5_path, mmap=mmap, dtype=dtype, workers=workers, read_data=(triggerChannel==None))
+        if triggerChannel!=None:
+            eeg.trigger = RunLengthTrigger.fromArray(data.read_trigger(triggerChannel))
     except:
         print('Error in reading poly5 file.')
         return None
@@ -52,9 +108,167 @@ def poly52POPO(poly5_path, name=None): #Converts into a Plain Old Python Object
     eeg.start_time = data.start_time
     eeg.sample_rate = data.sample_rate
     eeg.num_samples = data.num_samples
-    eeg.samples = data.samples
+    eeg.samples = data.samples if triggerChannel==None else None
     eeg.num_channels = data.num_channels
     for ch in data.channels:
         eeg.addChannel(ch.name, ch.unit_name)
+        
+    if cacheDir!=None:
+        metadata = {'name': data.name,
+                    'start_time': data.start_time.isoformat(),
+                    'sample_rate': data.sample_rate,
+                    'num_samples': data.num_samples,
+                    'num_channels': data.num_channels,
+                    'channels': [[ch.name, ch.unit_name] for ch in data.channels]}
+        if triggerChannel==None:
+            poly5CacheSave(poly5_path, cacheDir, data.samples, metadata, dtype)
+        else:
+            poly5TriggerCacheSave(poly5_path, cacheDir, triggerChannel, eeg.trigger, metadata)
     
-    return eeg
\ No newline at end of file
+    return eeg
+
+def read_many(poly5_paths, workers=None, names=None, **kwargs):
+    """Reads many .poly5 files concurrently in a process pool, e.g. the scalp and cEEGrid files for a whole cohort. This is a generator
+    yielding (poly5_path, eeg) pairs as each file finishes, so the order is not that of poly5_paths. names, if given, has one entry per path;
+    other keyword arguments (dtype, cacheDir, ...) are passed on to poly52POPO. workers defaults to the number of CPUs.
+
+    mmap=True is rejected with a ValueError: each mapped file would be read in full to send it back from its worker process. To get
+    only the events, use decode_many, or triggerChannel to read just the trigger."""
+    if kwargs.get('mmap'):
+        raise ValueError('read_many cannot memory-map files, as they would be copied in full out of the worker processes. For the '
+                         'events only, use decode_many or pass triggerChannel.')
+    if names==None:
+        names = [None]*len(poly5_paths)
+    return _readMany(poly5_paths, workers, names, kwargs)
+
+def _readMany(poly5_paths, workers, names, kwargs):
+    #Generator for read_many, so that its arguments are checked when it is called rather than when iteration starts.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(poly52POPO, poly5_path, name, **kwargs): poly5_path for poly5_path, name in zip(poly5_paths, names)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def _readAndDecode(poly5_path, name, decodeArgs, kwargs):
+    #Worker for decode_many. Only the events (and the compact trigger runs) are sent back to the parent process, not the samples.
+    eeg = poly52POPO(poly5_path, name, **kwargs)
+    if eeg!=None:
+        eeg.decode_events(**decodeArgs)
+        eeg.samples = None
+    return eeg
+
+def _estimateMemory(poly5_path, dtype, triggerOnly=False):
+    #Peak memory for reading and decoding one file: the (channels, samples) matrix, unless only the trigger is read, plus the
+    #uint8 trigger vector.
+    try:
+        info = Poly5Reader.probe(poly5_path)
+    except:
+        return 0
+    if triggerOnly:
+        return info['num_samples']
+    return info['num_samples']*(len(info['channels'])*np.dtype(dtype).itemsize + 1)
+
+def _defaultMemoryBudget():
+    #Half the physical memory, where the OS reports it; otherwise no limit.
+    try:
+        return os.sysconf('SC_PHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')//2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def decode_many(poly5_paths, names=None, workers=None, memoryBudget=None, triggerClk=8, thrError=-0.3, transError=0.1, **kwargs):
+    """Reads and decodes the triggers of several .poly5 files concurrently in a process pool, e.g. the scalp and cEEGrid files of
+    one participant. Returns their EEGData in the order of poly5_paths, with events decoded and samples dropped (None where a file
+    could not be read). Other keyword arguments (dtype, cacheDir, ...) are passed on to poly52POPO.
+
+    A file is only started while the estimated memory of the files in progress (from their headers) fits in memoryBudget bytes,
+    which defaults to half the physical memory, so two large recordings aren't fully resident at once. At least one file is always
+    in progress. workers defaults to one per file, up to the number of CPUs."""
+    if names==None:
+        names = [None]*len(poly5_paths)
+    if workers==None:
+        workers = max(1, min(len(poly5_paths), os.cpu_count() or 1))
+    if memoryBudget==None:
+        memoryBudget = _defaultMemoryBudget()
+    decodeArgs = {'triggerClk': triggerClk, 'thrError': thrError, 'transError': transError}
+    dtype = kwargs.get('dtype', np.float32)
+
+    eegs = [None]*len(poly5_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {} #future: (index, estimated memory)
+        for index, (poly5_path, name) in enumerate(zip(poly5_paths, names)):
+            memory = _estimateMemory(poly5_path, dtype, kwargs.get('triggerChannel')!=None)
+            while running and memoryBudget!=None and sum(m for _, m in running.values()) + memory > memoryBudget:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    eegs[running.pop(future)[0]] = future.result()
+            running[pool.submit(_readAndDecode, poly5_path, name, decodeArgs, kwargs)] = (index, memory)
+        for future in as_completed(running):
+            eegs[running[future][0]] = future.result()
+    return eegs
+
+class RecordingSet:
+    """Several .poly5 recordings of one session, in order, e.g. where recording was stopped and restarted, treated as one recording.
+    Samples have one global index running through the files, so sample i of file k is global sample offsets[k] + i. Only the headers
+    are read up front; samples are read lazily from whichever files hold them, and events decoded from each file are joined into
+    one array on the global index."""
+    def __init__(self, poly5_paths):
+        self.poly5_paths = list(poly5_paths)
+        infos = [Poly5Reader.probe(poly5_path) for poly5_path in self.poly5_paths]
+        if len(set(info['sample_rate'] for info in infos)) > 1:
+            raise ValueError('Recordings in a RecordingSet must have the same sample rate.')
+        self.sample_rate = infos[0]['sample_rate']
+        self.channels = infos[0]['channels']
+        self.lengths = np.array([info['num_stored_samples'] for info in infos], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]])
+        self.num_samples = int(self.lengths.sum())
+        self._readers = [None]*len(self.poly5_paths)
+
+    def locate(self, sample_idx):
+        """File index and sample index within that file of global sample index(es) sample_idx. Raises IndexError for any index
+        outside [0, num_samples), including negative ones."""
+        sample_idx = np.asarray(sample_idx)
+        if np.any((sample_idx < 0) | (sample_idx >= self.num_samples)):
+            raise IndexError('Sample index out of range [0, ' + str(self.num_samples) + ').')
+        file_index = np.searchsorted(self.offsets, sample_idx, side='right') - 1
+        return file_index, sample_idx - self.offsets[file_index]
+
+    def read(self, channels=None, start=0, stop=None):
+        """Reads some channels and/or the global sample range [start, stop), as Poly5Reader.read, from the files it covers. A range
+        within one file is read directly; one spanning files is joined."""
+        if isinstance(channels, (int, np.integer)):
+            channels = [channels]
+        if stop is None or stop > self.num_samples:
+            stop = self.num_samples
+        start = max(0, min(start, stop))
+        parts = []
+        for k in range(len(self.poly5_paths)):
+            first, last = max(start, self.offsets[k]), min(stop, self.offsets[k] + self.lengths[k])
+            if first >= last:
+                continue
+            if self._readers[k] is None:
+                self._readers[k] = Poly5Reader(self.poly5_paths[k], read_data=False)
+            parts.append(self._readers[k].read(channels, first - self.offsets[k], last - self.offsets[k]))
+        if len(parts)==1:
+            return parts[0]
+        if len(parts)==0:
+            return np.empty((self.num_channels if channels is None else len(channels), 0), dtype=np.float32)
+        return np.concatenate(parts, axis=1)
+
+    @property
+    def num_channels(self):
+        return len(self.channels)
+
+    def join_events(self, events):
+        """Joins events decoded from each file (structured arrays with 'sample_idx', e.g. EEGData.events, one per file in order) into
+        one array, with sample_idx on the global index."""
+        joined = np.concatenate(events)
+        joined['sample_idx'] += np.repeat(self.offsets, [len(fileEvents) for fileEvents in events])
+        return joined
+
+    def decode_events(self, names=None, **kwargs):
+        """Decodes the triggers of all the files concurrently with decode_many (which takes the other keyword arguments), and returns
+        their events joined on the global index. Raises ValueError naming the first file that could not be read."""
+        eegs = decode_many(self.poly5_paths, names, **kwargs)
+        for poly5_path, eeg in zip(self.poly5_paths, eegs):
+            if eeg is None:
+                raise ValueError('Could not read ' + poly5_path + ', so its events cannot be joined with the others.')
+        return self.join_events([eeg.events for eeg in eegs])
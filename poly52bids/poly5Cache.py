@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+import numpy as np
+from SerialTriggerDecoder import RunLengthTrigger
+
+"""On-disk cache of decoded Poly5 samples, so repeated runs (e.g., while tuning trigger corrections) don't have to re-parse the same
+large files. For each Poly5 file, the (channels, samples) matrix is stored as an uncompressed .npy file, which is memory-mapped when
+loaded, plus a small .json file with the channel metadata and the key it was cached under.
+
+The key is the file's absolute path, size, modification time and a content hash. Hashing multi-GB files in full would cost almost as
+much as reading them, so the hash covers the header/channel descriptions plus the first and last FINGERPRINT_SIZE bytes of the file.
+
+When only the trigger channel is needed, its runs (see RunLengthTrigger) are cached instead, as a .npz file of a few KB."""
+
+FINGERPRINT_SIZE = 1 << 20 #bytes
+
+def poly5CacheKey(poly5_path, dtype):
+    poly5_path = os.path.abspath(poly5_path)
+    stat = os.stat(poly5_path)
+
+    fingerprint = hashlib.sha1()
+    with open(poly5_path, 'rb') as f:
+        fingerprint.update(f.read(FINGERPRINT_SIZE))
+        if stat.st_size > FINGERPRINT_SIZE:
+            f.seek(max(FINGERPRINT_SIZE, stat.st_size - FINGERPRINT_SIZE))
+            fingerprint.update(f.read())
+
+    return {"path": poly5_path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": fingerprint.hexdigest(),
+            "dtype": np.dtype(dtype).str}
+
+def _cacheFiles(poly5_path, cacheDir, suffix="", extension=".npy"):
+    #One entry per source path; the key stored alongside decides whether it is still valid.
+    stem = os.path.splitext(os.path.basename(poly5_path))[0]
+    pathHash = hashlib.sha1(os.path.abspath(poly5_path).encode('utf-8')).hexdigest()[:12]
+    base = os.path.join(cacheDir, stem + "_" + pathHash + suffix)
+    return base + extension, base + ".json"
+
+def poly5CacheLoad(poly5_path, cacheDir, dtype=np.float32):
+    """Return (samples, metadata) for poly5_path if a valid cache entry exists, otherwise None. samples is a read-only memory map."""
+    samplesFile, metadataFile = _cacheFiles(poly5_path, cacheDir)
+    if not (os.path.exists(samplesFile) and os.path.exists(metadataFile)):
+        return None
+
+    with open(metadataFile, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    if metadata.get("key") != poly5CacheKey(poly5_path, dtype):
+        print("Cached samples for " + poly5_path + " are out of date, re-reading the file.")
+        return None
+
+    samples = np.load(samplesFile, mmap_mode='r')
+    print("Loaded cached samples for " + poly5_path)
+    return samples, metadata
+
+def poly5CacheSave(poly5_path, cacheDir, samples, metadata, dtype=np.float32):
+    """Store samples and metadata (a json-serialisable dict) for poly5_path. Files are written under temporary names and then renamed,
+    so an interrupted run never leaves a half-written entry that looks valid."""
+    os.makedirs(cacheDir, exist_ok=True)
+    samplesFile, metadataFile = _cacheFiles(poly5_path, cacheDir)
+
+    metadata = dict(metadata, key=poly5CacheKey(poly5_path, dtype))
+    with open(samplesFile + ".tmp", 'wb') as f:
+        np.save(f, np.asarray(samples, dtype=dtype))
+    with open(metadataFile + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
+    os.replace(samplesFile + ".tmp", samplesFile)
+    os.replace(metadataFile + ".tmp", metadataFile)
+
+def poly5TriggerCacheLoad(poly5_path, cacheDir, triggerChannel):
+    """Return (trigger, metadata) for the given trigger channel (index or name) of poly5_path if a valid cache entry exists, otherwise
+    None. trigger is a RunLengthTrigger."""
+    triggerFile, metadataFile = _cacheFiles(poly5_path, cacheDir, "_trigger-" + str(triggerChannel), ".npz")
+    if not (os.path.exists(triggerFile) and os.path.exists(metadataFile)):
+        return None
+
+    with open(metadataFile, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    if metadata.get("key") != poly5CacheKey(poly5_path, np.uint8):
+        print("Cached trigger for " + poly5_path + " is out of date, re-reading the file.")
+        return None
+
+    print("Loaded cached trigger for " + poly5_path)
+    return RunLengthTrigger.load(triggerFile), metadata
+
+def poly5TriggerCacheSave(poly5_path, cacheDir, triggerChannel, trigger, metadata):
+    """Store a RunLengthTrigger and metadata for the given trigger channel of poly5_path, as poly5CacheSave does for samples."""
+    os.makedirs(cacheDir, exist_ok=True)
+    triggerFile, metadataFile = _cacheFiles(poly5_path, cacheDir, "_trigger-" + str(triggerChannel), ".npz")
+
+    metadata = dict(metadata, key=poly5CacheKey(poly5_path, np.uint8))
+    trigger.save(triggerFile + ".tmp")
+    with open(metadataFile + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
+    os.replace(triggerFile + ".tmp", triggerFile)
+    os.replace(metadataFile + ".tmp", metadataFile)
@@ -0,0 +1,120 @@
+from SerialTriggerDecoder import *
+import numpy as np
+import os
+import io
+import sys
+import time
+import tempfile
+import contextlib
+from unittest import mock
+
+"""Benchmarks the trigger decoders on synthetic trigger signals (see SerialTriggerDecoder.generateTrialTrigger), measuring decoding
+throughput (samples/s) and accuracy against the events that were sent, so changes to the decoder can be checked against earlier
+numbers. Run as a script, optionally with the signal lengths to test (in samples):
+
+    python triggerDecoderBenchmark.py 1000000 10000000
+
+By default, 1, 10 and 100 million samples are tested. Each combination is decoded REPEATS times, and the fastest run is reported."""
+
+SIZES = [10**6, 10**7, 10**8]
+METHODS = ['decode', 'decode_2', 'decodeWithRef']
+REPEATS = 3
+
+#Trigger settings used in poly52trigs
+TRIGGER_CLK = 16
+THR_ERROR = -0.05
+TRANS_ERROR = 0.1
+FS_EEG = 1000
+
+#Signal conditions: name, and keyword arguments for generateTrialTrigger
+CONDITIONS = [('clean', {}),
+              ('jitter', {'jitter': 1}),
+              ('glitches', {'glitchRate': 0.05}),
+              ('dropouts', {'dropoutRate': 0.01})]
+
+def eventAccuracy(events, trueEvents, tolerance):
+    """Fraction of trueEvents decoded with the right code, within tolerance samples of the right place. events are dicts as
+    returned by decode(); decoded sample indices are one sample early (see generateTrialTrigger), which is allowed for."""
+    if len(trueEvents) == 0:
+        return np.nan
+    if len(events) == 0:
+        return 0.0
+    decodedIdx = np.array([event['sample_idx'] for event in events], dtype=np.int64) + 1
+    decodedCodes = np.array([event['code'] for event in events], dtype=np.int64)
+    trueIdx = trueEvents['sample_idx']
+
+    #Nearest decoded event to each true event
+    after = np.clip(np.searchsorted(decodedIdx, trueIdx), 0, len(decodedIdx) - 1)
+    before = np.clip(after - 1, 0, len(decodedIdx) - 1)
+    nearest = np.where(np.abs(decodedIdx[before] - trueIdx) < np.abs(decodedIdx[after] - trueIdx), before, after)
+    matched = (np.abs(decodedIdx[nearest] - trueIdx) <= tolerance) & (decodedCodes[nearest] == trueEvents['code'])
+    return matched.mean()
+
+def writeReference(trueEvents, path, max_trig_distance=SerialTriggerDecoder.MAX_TRIG_DISTANCE):
+    #Reference codes in the format decodeWithRef expects: one per line, with -1 before an event that follows a long gap.
+    gaps = np.diff(trueEvents['sample_idx'], prepend=trueEvents['sample_idx'][:1])
+    with open(path, 'w') as f:
+        for gap, code in zip(gaps, trueEvents['code']):
+            if gap > max_trig_distance*FS_EEG*(1+TRANS_ERROR):
+                f.write("-1\n")
+            f.write(str(code) + "\n")
+
+class _NoPlots:
+    #Stands in for pyplot in the decoder module while benchmarking, as decode_2 plots the whole trigger, which isn't decoding
+    def plot(self, *args, **kwargs):
+        pass
+
+def benchmarkDecoder(method, trigger, trueEvents, repeats=REPEATS):
+    """Decodes trigger with the given SerialTriggerDecoder method, and returns (samples per second, accuracy). Raises whatever the
+    decoder raises. Plots the decoder makes (decode_2 plots the trigger) are skipped."""
+    refPath = None
+    if method == 'decodeWithRef':
+        fd, refPath = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+        writeReference(trueEvents, refPath)
+
+    try:
+        best = np.inf
+        for _ in range(repeats):
+            decoder = SerialTriggerDecoder(trigger, FS_EEG, TRIGGER_CLK, THR_ERROR, TRANS_ERROR)
+            #The decoders print a warning per bad event
+            with contextlib.redirect_stdout(io.StringIO()), mock.patch.object(sys.modules[SerialTriggerDecoder.__module__], 'plt',
+                                                                             _NoPlots()):
+                start = time.perf_counter()
+                if method == 'decodeWithRef':
+                    events = decoder.decodeWithRef(refPath)[0]
+                else:
+                    events = getattr(decoder, method)()
+                best = min(best, time.perf_counter() - start)
+    finally:
+        if refPath != None:
+            os.remove(refPath)
+
+    tolerance = round(FS_EEG/TRIGGER_CLK/2)
+    return len(trigger)/best, eventAccuracy(events, trueEvents, tolerance)
+
+def runBenchmarks(sizes=SIZES, methods=METHODS, conditions=CONDITIONS, repeats=REPEATS, seed=0):
+    """Benchmarks each method on a signal of each size and condition, printing a line per result as it goes. Returns the results as
+    a list of dicts with 'size', 'condition', 'method', 'samples_per_s', 'accuracy' and 'error' (None, or the error message if the
+    method failed)."""
+    results = []
+    print("{:>12} {:>10} {:>14} {:>16} {:>9}".format("samples", "condition", "method", "samples/s", "accuracy"))
+    for size in sizes:
+        for condition, conditionArgs in conditions:
+            trigger, trueEvents = SerialTriggerDecoder.generateTrialTrigger(size, fsEEG=FS_EEG, clkSerial=TRIGGER_CLK, seed=seed,
+                                                                            **conditionArgs)
+            for method in methods:
+                result = {'size': size, 'condition': condition, 'method': method, 'samples_per_s': np.nan, 'accuracy': np.nan,
+                          'error': None}
+                try:
+                    result['samples_per_s'], result['accuracy'] = benchmarkDecoder(method, trigger, trueEvents, repeats)
+                    print("{:>12} {:>10} {:>14} {:>16.0f} {:>9.4f}".format(size, condition, method, result['samples_per_s'],
+                                                                          result['accuracy']))
+                except Exception as e:
+                    result['error'] = type(e).__name__ + ": " + str(e)
+                    print("{:>12} {:>10} {:>14}   FAILED - {}".format(size, condition, method, result['error']))
+                results.append(result)
+    return results
+
+if __name__ == "__main__":
+    runBenchmarks([int(float(size)) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,24 @@
+import struct
+
+import numpy as np
+
+"""Writes small synthetic .Poly5 files for the tests."""
+
+def writePoly5(path, data, sampleRate=1000, samplesPerBlock=100, missingBlocks=0):
+    """Writes data (channels, samples) as a .Poly5 file at path. missingBlocks leaves that many data blocks off the end of the file,
+    as in a truncated recording, while the header still counts them."""
+    numChannels, numSamples = data.shape
+    numBlocks = -(-numSamples//samplesPerBlock)
+    out = [struct.pack("=31sH81phhBHi4xHHHHHHHiHHH64x", b'POLY SAMPLE FILEversion 2.03\r\n\x1a', 203, b'test', sampleRate,
+                       sampleRate, 0, numChannels*2, numSamples, 2023, 9, 1, 5, 10, 20, 30, numBlocks, samplesPerBlock,
+                       numChannels*samplesPerBlock*4, 0)]
+    for c in range(numChannels):
+        description = struct.pack("=41p4x11pffffHH60x", b'(Lo) ' + ('UNI%02d' % c).encode(), b'uV', -1.0, 1.0, -1.0, 1.0, c, 0)
+        out += [description, description]
+    padded = np.zeros((numChannels, numBlocks*samplesPerBlock), np.float32)
+    padded[:, :numSamples] = data
+    for b in range(numBlocks - missingBlocks):
+        out.append(struct.pack('=i', b) + b'\0'*82)
+        out.append(np.ascontiguousarray(padded[:, b*samplesPerBlock:(b+1)*samplesPerBlock].T).tobytes())
+    with open(path, 'wb') as f:
+        f.write(b''.join(out))
@@ -0,0 +1,73 @@
+import contextlib
+import io
+
+import numpy as np
+
+from SerialTriggerDecoder import *
+
+TRIGGER_CLK = 16
+THR_ERROR = -0.05
+TRANS_ERROR = 0.1
+FS_EEG = 1000
+
+#decode() of the signal from _noisyTrigger, as given by the original sample-by-sample decoder: (sample_idx, pattern)
+EXPECTED_EVENTS = [(660, '1000001'), (1742, '00000'), (2558, '00011101'), (3709, '0010011'), (4845, '00011101'), (6072, '10000000'),
+                   (7103, '10001011'), (8329, '011101'), (9302, '00000'), (10253, '0001111'), (11081, '00110101'),
+                   (12174, '01000101'), (13372, '01100011'), (14538, '01001101'), (15397, '001011'), (16215, '00011010'),
+                   (17612, '0111'), (18621, '011101')]
+
+
+def _noisyTrigger():
+    trigger, _ = SerialTriggerDecoder.generateTrialTrigger(20000, fsEEG=FS_EEG, clkSerial=TRIGGER_CLK, jitter=1, glitchRate=2, seed=3)
+    #Without the final transition added by generateTrialTrigger, as in the signal the expected events were decoded from
+    trigger[-1] = 0
+    return trigger
+
+
+def _decoder(trigger, **kwargs):
+    return SerialTriggerDecoder(trigger, FS_EEG, TRIGGER_CLK, THR_ERROR, TRANS_ERROR, **kwargs)
+
+
+def _decode(trigger, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _decoder(trigger, **kwargs).decode()
+
+
+def test_decode_matches_expected_events():
+    events = _decode(_noisyTrigger())
+
+    assert [(event['sample_idx'], event['pattern']) for event in events] == EXPECTED_EVENTS
+    assert [event['code'] for event in events] == [int(pattern, 2) for _, pattern in EXPECTED_EVENTS]
+
+
+def test_feed_in_random_chunks_matches_decode():
+    trigger = _noisyTrigger()
+    expected = _decode(trigger)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        splits = np.sort(rng.integers(0, len(trigger), rng.integers(1, 40)))
+        decoder = _decoder(None)
+        events = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for chunk in np.split(trigger, splits):
+                events += decoder.feed(chunk)
+            events += decoder.flush()
+        assert events == expected
+
+
+def test_run_length_trigger_matches_array():
+    trigger = _noisyTrigger()
+
+    assert _decode(RunLengthTrigger.fromArray(trigger)) == _decode(trigger)
+
+
+def test_min_glitch_width_sets_which_pulses_are_merged():
+    trigger, trueEvents = SerialTriggerDecoder.generateTrialTrigger(5000, fsEEG=FS_EEG, clkSerial=TRIGGER_CLK, codes=[85], seed=0)
+    #A 3-sample low pulse in the middle of the start bit's high half period of each event
+    for start in trueEvents['sample_idx']:
+        trigger[start + 14:start + 17] = 0
+    trueCodes = [int(code) for code in trueEvents['code']]
+
+    assert [event['code'] for event in _decode(trigger)] == trueCodes
+    assert [event['code'] for event in _decode(trigger, min_glitch_width=4)] == trueCodes
+    assert [event['code'] for event in _decode(trigger, min_glitch_width=3)] != trueCodes
@@ -0,0 +1,44 @@
+import numpy as np
+
+from eventAlignment import *
+
+
+def test_alignEvents_with_missing_leading_events():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(1, 6, 40)
+    latencies = np.cumsum(rng.integers(700, 5000, 40))
+    missing = 15
+    codes2, latencies2 = codes[missing:], latencies[missing:] + 123456
+
+    alignment = alignEvents(codes, latencies, codes2, latencies2)
+
+    assert np.array_equal(alignment['index1'], np.arange(40))
+    assert np.array_equal(alignment['index2'], np.concatenate([np.full(missing, -1), np.arange(40 - missing)]))
+    assert np.array_equal(alignment['kind'], np.concatenate([np.full(missing, ALIGN_ONLY_1), np.full(40 - missing, ALIGN_MATCH)]))
+
+
+def test_alignEvents_across_a_long_break_with_drift():
+    rng = np.random.default_rng(1)
+    codes = rng.integers(1, 6, 400)
+    latencies = np.cumsum(rng.integers(700, 5000, 400))
+    latencies[200:] += 600000 #10 minutes without triggers
+    latencies2 = np.round(latencies*(1 + 60e-6) + 777).astype(np.int64)
+
+    alignment = alignEvents(codes, latencies, codes, latencies2)
+
+    assert np.array_equal(alignment['index1'], np.arange(400))
+    assert np.array_equal(alignment['index2'], np.arange(400))
+    assert np.all(alignment['kind']==ALIGN_MATCH)
+
+
+def test_alignEvents_after_a_jump_in_one_stream():
+    rng = np.random.default_rng(2)
+    codes = rng.integers(1, 6, 100)
+    latencies = np.cumsum(rng.integers(700, 5000, 100))
+    latencies2 = latencies + 5000
+    latencies2[50:] += 1500
+
+    alignment = alignEvents(codes, latencies, codes, latencies2)
+
+    assert np.all(alignment['kind']==ALIGN_MATCH)
+    assert len(alignment)==100
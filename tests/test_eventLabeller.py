@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+from eventLabeller import *
+import poly52trigs_allVersions
+
+"""Labels small synthetic sessions and compares the events files with those written by the original per-part loops, in
+tests/data/eventLabeller, with onsets as formatted by formatOnsets."""
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "eventLabeller")
+SFREQ = 1000
+
+#Parts of a session. P1 and P3 have a single practice trial and code 46 (whose onset is shifted); P2 has numbered practice trials.
+#Codes 200, 201, 150 and 10 match no rule within their part, so they keep the significance of the event before them.
+P1 = [3, 4, 154, 5, 6, 45, 46, 7, 200, 8, 155]
+P2 = [73, 145, 74, 75, 146, 201, 76, 156, 77, 146, 149, 78, 79, 10, 80, 157]
+P3 = [1, 2, 158, 45, 46, 3, 150, 4, 159]
+#For the partial ceegrid options below: P2 runs past its early stop, and P3 has events before its late start
+P2_PARTIAL = [73, 145, 74, 156, 75, 147, 76, 77, 153, 78, 79, 80, 81, 82, 157]
+P3_PARTIAL = [1, 2, 158, 3, 4, 5, 6, 7, 8, 45, 46, 9, 10, 159]
+PARTIAL_OPTIONS = {"attnMultInstOBs": {"earlyStop": 1544.141},
+                   "attnOneInstNoOBs": {"lateStart": 2694.658, "firstTrial": 3}}
+
+
+def _session(parts, starts, step=1037.3):
+    #Codes and latencies (samples) of parts starting at the given latencies, with slightly uneven gaps between events
+    codes, latencies = [], []
+    for part, start in zip(parts, starts):
+        for k, code in enumerate(part):
+            codes.append(code)
+            latencies.append(int(round(start + k*step + (k*k) % 7)))
+    return np.array(codes), np.array(latencies)
+
+
+def _assertFilesMatch(eventsFiles, case, tmp_path):
+    #Writes each events file under its own name (the part of the path after the last separator) and compares it with the expected one
+    for path, events in eventsFiles.items():
+        name = path.replace("\\", "/").split("/")[-1]
+        writeEventsTsv(str(tmp_path / name), events)
+        with open(os.path.join(DATA_DIR, case, name), newline='') as expected, open(tmp_path / name, newline='') as actual:
+            assert actual.read() == expected.read(), name
+
+
+def test_labelPartEvents_session(tmp_path):
+    codes, latencies = _session([P1, P2, P3], [5000, 1010000, 2010000])
+
+    eventsFiles, partStartEndLatencies = labelPartEvents("", "sub-09", "scalp", codes, latencies, SFREQ, 0.5)
+
+    _assertFilesMatch(eventsFiles, "plain", tmp_path)
+    assert np.allclose(partStartEndLatencies, [[4.5, 1009.5, 2009.5], [15.875, 1026.06, 2018.799]])
+
+
+@pytest.mark.parametrize("acq, taskOptions, expectedLatencies",
+                         [("scalp", {}, [[4.0, 1529.0, 2687.0], [20.379, 1551.128, 2707.691]]),
+                          ("ceegrid", PARTIAL_OPTIONS, [[4.0, 1529.0, 2693.658], [20.379, 1545.141, 2707.691]])])
+def test_labelPartEvents_early_stop_and_late_start(tmp_path, acq, taskOptions, expectedLatencies):
+    codes, latencies = _session([P1, P2_PARTIAL, P3_PARTIAL], [5000, 1530000, 2688000], step=1437.7)
+
+    eventsFiles, partStartEndLatencies = labelPartEvents("", "sub-06", acq, codes, latencies, SFREQ, 1, taskOptions)
+
+    _assertFilesMatch(eventsFiles, "partial", tmp_path)
+    assert np.allclose(partStartEndLatencies, expectedLatencies)
+
+
+def test_labelExtraData(tmp_path):
+    events = {modality: _session([[73, 145, 74, 156, 75, 146, 76, 77, 78, 79, 80]], [1010000]) for modality in ("scalp", "ceegrid")}
+
+    eventsFiles, partStartEndLatencies = poly52trigs_allVersions.labelExtraData(str(tmp_path) + "/", "09", events, 0.5,
+                                                                                partTask="attnMultInstOBs",
+                                                                                task="attnMultInstOBsExtra")
+
+    _assertFilesMatch(eventsFiles, "extra09", tmp_path)
+    assert np.allclose(partStartEndLatencies["scalp"], [1009.5, 1020.875])
+
+
+def test_labelExtraData_with_final_code_from_another_modality(tmp_path):
+    #The ceegrid file goes on past the scalp one's last trial end code (6), but ends there too
+    events = {"scalp": _session([[1, 2, 158, 3, 4, 45, 46, 5, 6, 7]], [2010000]),
+              "ceegrid": _session([[1, 2, 158, 3, 4, 45, 46, 5, 6, 7, 8, 9]], [2010000])}
+
+    eventsFiles, partStartEndLatencies = poly52trigs_allVersions.labelExtraData(str(tmp_path) + "/", "28", events, 0.5,
+                                                                                partTask="attnOneInstNoOBs",
+                                                                                task="attnOneInstNoOBsExtra",
+                                                                                finalCodeFrom={"ceegrid": "scalp"})
+
+    _assertFilesMatch(eventsFiles, "extra28", tmp_path)
+    assert np.allclose(partStartEndLatencies["ceegrid"], [2009.5, 2018.799])
@@ -0,0 +1,33 @@
+import numpy as np
+
+import poly52trigs_allVersions
+
+
+def test_checkEvents_without_enough_pairs_to_fit_clock(monkeypatch, capsys):
+    monkeypatch.setattr(poly52trigs_allVersions, "expectedTriggerCalculator", lambda basePath, participantNumber: 2)
+    events = {"scalp": (np.array([10, 20]), np.array([1000, 5000])),
+              "ceegrid": (np.array([10, 30]), np.array([1003, 9000]))}
+
+    poly52trigs_allVersions.checkEvents("", "01", events)
+
+    out = capsys.readouterr().out
+    assert "COULD NOT FIT THE CEEGRID CLOCK" in out
+    assert " ppm" not in out
+
+
+def test_checkEvents_matches_split_recordings_separately(monkeypatch, capsys):
+    monkeypatch.setattr(poly52trigs_allVersions, "expectedTriggerCalculator", lambda basePath, participantNumber: 34)
+    rng = np.random.default_rng(0)
+    codes = rng.integers(1, 6, 34)
+    gaps = rng.integers(700, 5000, 34)
+    #17 events per recording, each 100000 samples long. The second ceegrid recording starts 1.5 s after the second scalp one
+    scalpLatencies = np.concatenate([np.cumsum(gaps[:17]), 100000 + 3000 + np.cumsum(gaps[17:])])
+    ceegridLatencies = np.concatenate([np.cumsum(gaps[:17]) + 300, 100000 + 1500 + np.cumsum(gaps[17:])])
+    events = {"scalp": (codes, scalpLatencies), "ceegrid": (codes, ceegridLatencies)}
+    recordingStarts = {"scalp": np.array([0, 100000]), "ceegrid": np.array([0, 100000])}
+
+    poly52trigs_allVersions.checkEvents("", "01", events, recordingStarts)
+
+    out = capsys.readouterr().out
+    assert "WARNING" not in out
+    assert out.count("17 out of 17 paired events have the same code") == 2
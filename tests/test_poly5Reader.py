@@ -0,0 +1,31 @@
+import numpy as np
+
+from TMSiSDK_poly5Reader import *
+from poly5Files import writePoly5
+
+
+def _truncatedFile(tmp_path):
+    data = np.random.default_rng(0).normal(size=(8, 90000)).astype(np.float32)
+    path = str(tmp_path / "truncated.Poly5")
+    writePoly5(path, data, missingBlocks=3)
+    return path, data[:, :89700]
+
+
+def test_parallel_read_of_truncated_file_matches_serial_read(tmp_path):
+    path, stored = _truncatedFile(tmp_path)
+
+    serial = Poly5Reader(path).samples
+    parallel = Poly5Reader(path, workers=4).samples
+
+    assert np.array_equal(serial, stored)
+    assert np.array_equal(parallel, stored)
+
+
+def test_mapping_truncated_file_maps_stored_samples(tmp_path):
+    path, stored = _truncatedFile(tmp_path)
+
+    samples = Poly5Reader(path, mmap=True).samples
+
+    assert samples.shape == stored.shape
+    assert np.array_equal(samples[:, :], stored)
+    assert np.array_equal(samples[3, 89000:], stored[3, 89000:])
@@ -0,0 +1,34 @@
+import functools
+import os
+
+import numpy as np
+import pytest
+
+from triggerDecoderBenchmark import *
+
+"""Benchmark suite for the trigger decoders: decoding throughput (samples/s) and accuracy for each method and signal condition of
+triggerDecoderBenchmark, recorded as properties of each test (e.g. in the report from pytest --junitxml). Only 1 million samples
+are tested by default; set POLY52BIDS_BENCHMARK_SIZES to test others, e.g. POLY52BIDS_BENCHMARK_SIZES=1e6,1e7,1e8."""
+
+BENCHMARK_SIZES = [int(float(size)) for size in os.environ.get("POLY52BIDS_BENCHMARK_SIZES", "1e6").split(",")]
+
+
+@functools.lru_cache(maxsize=None)
+def _signal(size, condition):
+    return SerialTriggerDecoder.generateTrialTrigger(size, fsEEG=FS_EEG, clkSerial=TRIGGER_CLK, seed=0, **dict(CONDITIONS)[condition])
+
+
+@pytest.mark.parametrize("size", BENCHMARK_SIZES)
+@pytest.mark.parametrize("condition", [condition for condition, _ in CONDITIONS])
+@pytest.mark.parametrize("method", METHODS)
+def test_decoder_throughput_and_accuracy(method, condition, size, record_property):
+    trigger, trueEvents = _signal(size, condition)
+
+    samplesPerS, accuracy = benchmarkDecoder(method, trigger, trueEvents, repeats=1)
+
+    record_property("samples_per_s", samplesPerS)
+    record_property("accuracy", accuracy)
+    assert samplesPerS > 0
+    assert 0 <= accuracy <= 1
+    if condition == "clean" and method != "decode_2": #decode_2 rewrites some codes, for one recording
+        assert accuracy == 1